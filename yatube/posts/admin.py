@@ -1,18 +1,177 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.exceptions import ValidationError
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections
+from django.http import HttpResponseBadRequest
+from django.urls import path
+from django.utils.functional import cached_property
 
-from .models import Post, Group
+from . import feeds, holes, objcache
+from .exports import CONTENT_TYPES, export_response
+from .models import Comment, Follow, Group, Post
+
+
+class EstimatedCountPaginator(Paginator):
+    '''Пагинатор changelist без COUNT(*) по всей таблице.
+
+    Для нефильтрованного списка число строк берется из статистики
+    PostgreSQL (pg_class.reltuples) или по MAX(id) для остальных баз;
+    отфильтрованные списки считаются как обычно.'''
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.where:
+            return super().count
+        model = queryset.model
+        connection = connections[queryset.db]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class '
+                    'WHERE relname = %s',
+                    [model._meta.db_table]
+                )
+            else:
+                cursor.execute('SELECT MAX({}) FROM {}'.format(
+                    connection.ops.quote_name(model._meta.pk.column),
+                    connection.ops.quote_name(model._meta.db_table),
+                ))
+            row = cursor.fetchone()
+        if not row or not row[0] or row[0] < 0:
+            return super().count
+        return row[0]
+
+
+def export_csv(modeladmin, request, queryset):
+    return export_response(queryset, 'csv')
+
+
+export_csv.short_description = 'Выгрузить в CSV'
+
+
+def export_ndjson(modeladmin, request, queryset):
+    return export_response(queryset, 'ndjson')
+
+
+export_ndjson.short_description = 'Выгрузить в NDJSON'
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Без второго COUNT(*) "всего N" рядом с отфильтрованным числом
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+    actions = [export_csv, export_ndjson]
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('export/', self.admin_site.admin_view(self.export_view),
+                 name='%s_%s_export' % info),
+        ] + super().get_urls()
+
+    def export_view(self, request):
+        '''Выгрузка всего отфильтрованного списка:
+        export/?format=csv|ndjson&<фильтры changelist>'''
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        request.GET = request.GET.copy()
+        export_format = request.GET.pop('format', ['csv'])[0]
+        if export_format not in CONTENT_TYPES:
+            return HttpResponseBadRequest('Формат: csv или ndjson')
+        changelist = self.get_changelist_instance(request)
+        return export_response(changelist.get_queryset(request),
+                               export_format)
+
+
+class PostActionForm(ActionForm):
+    group = forms.ModelChoiceField(Group.objects.all(), required=False,
+                                   label='Группа')
+
+
+def delete_author_spam(modeladmin, request, queryset):
+    '''Удаляет все посты и комментарии авторов выбранных записей'''
+    # Список авторов нужен до удаления: queryset может быть по комментариям
+    authors = list(queryset.values_list('author_id', flat=True).distinct())
+    comments, _ = Comment.objects.filter(author_id__in=authors).delete()
+    posts, _ = Post.objects.filter(author_id__in=authors).delete()
+    modeladmin.message_user(
+        request, f'Удалено записей: {posts}, комментариев: {comments}')
+
+
+delete_author_spam.short_description = 'Удалить все записи их авторов'
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'text', 'pub_date', 'author')
+class PostAdmin(LargeTableAdmin):
+    list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'views')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
+    # Фильтр по фиксированным интервалам дат не делает запросов к БД
     list_filter = ('pub_date',)
-    empty_value_display = '-пусто-'
+    date_hierarchy = 'pub_date'
+    raw_id_fields = ('author',)
+    action_form = PostActionForm
+    actions = LargeTableAdmin.actions + ['reassign_group',
+                                         delete_author_spam]
+
+    def reassign_group(self, request, queryset):
+        '''Переносит выбранные записи в группу одним UPDATE'''
+        field = self.action_form.base_fields['group']
+        try:
+            group = field.clean(request.POST.get('group'))
+        except ValidationError:
+            self.message_user(request, 'Группа не найдена',
+                              level=messages.ERROR)
+            return
+        pks = list(queryset.values_list('pk', flat=True))
+        groups = set(Post.objects.filter(
+            pk__in=pks, group__isnull=False
+        ).order_by().values_list('group_id', flat=True).distinct())
+        updated = Post.objects.filter(pk__in=pks).update(group=group)
+        # update() не посылает post_save, кэш объектов сбрасываем сами
+        objcache.invalidate(Post, pks)
+        holes.bump(*holes.post_scopes(pks))
+        if group is not None:
+            groups.add(group.pk)
+        feeds.bump(*(f'group:{pk}' for pk in groups))
+        self.message_user(
+            request, f'Записей перенесено в «{group or "без группы"}»: '
+                     f'{updated}')
+
+    reassign_group.short_description = 'Перенести в группу'
+
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            obj.read_image_meta()
+        super().save_model(request, obj, form, change)
 
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
     search_fields = ('title',)
+    prepopulated_fields = {'slug': ('title',)}
     empty_value_display = '-пусто-'
+
+
+@admin.register(Comment)
+class CommentAdmin(LargeTableAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    search_fields = ('text',)
+    date_hierarchy = 'created'
+    raw_id_fields = ('author', 'post')
+    actions = LargeTableAdmin.actions + [delete_author_spam]
+
+
+@admin.register(Follow)
+class FollowAdmin(LargeTableAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    raw_id_fields = ('user', 'author')
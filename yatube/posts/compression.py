@@ -0,0 +1,33 @@
+'''
+Сжатие gzip для страниц и других текстовых ответов.
+
+CompressionMiddleware - GZipMiddleware только для типов из
+COMPRESSION_CONTENT_TYPES и для ответов от COMPRESSION_MIN_LENGTH байт:
+маленький ответ после сжатия почти не уменьшается, а процессор тратит.
+Потоковые ответы (карты сайта, выгрузки) сжимаются по частям без
+буферизации; поток событий text/event-stream не сжимается, чтобы
+события не задерживались в буфере компрессора. Файлы медиа и статики
+уже сжаты или сжимаются заранее (posts.staticfiles).
+
+Подключается сразу после SecurityMiddleware, чтобы сжимать ответ со
+всеми подставленными фрагментами (posts.holes). Токен CSRF в формах
+маскируется заново в каждом ответе, поэтому атака BREACH на него не
+работает.
+'''
+from django.middleware.gzip import GZipMiddleware
+
+from .conf import setting
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if not setting('COMPRESSION_ENABLED'):
+            return response
+        content_type = response.get('Content-Type', '').partition(';')[0]
+        types = setting('COMPRESSION_CONTENT_TYPES')
+        if content_type.strip().lower() not in types:
+            return response
+        if (not response.streaming
+                and len(response.content) < setting('COMPRESSION_MIN_LENGTH')):
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,28 @@
+'''
+Настройки приложения posts и общий счетчик в кэше.
+
+Значения по умолчанию всех настроек posts заданы только в
+yatube/settings/base.py; модули читают их через setting() в момент
+использования, поэтому override_settings в тестах действует сразу.
+'''
+from django.conf import settings
+
+
+def setting(name):
+    return getattr(settings, name)
+
+
+def incr(cache, key, delta=1, initial=None):
+    '''Атомарно увеличивает бессрочный счетчик (версию, статистику) в кэше.
+
+    Отсутствующий или вытесненный счетчик создается со значением
+    initial (по умолчанию delta). Возвращает новое значение.'''
+    initial = delta if initial is None else initial
+    if cache.add(key, initial, None):
+        return initial
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Ключ вытеснили между add и incr
+        cache.set(key, initial, None)
+        return initial
@@ -0,0 +1,192 @@
+'''
+Режим деградации при медленной или недоступной БД.
+
+DegradedModeMiddleware стоит первым: до сессий и авторизации, которые
+сами обращаются к БД. Она считает время запросов к БД на каждый запрос и
+ведет автомат (circuit breaker) на процесс: сбой соединения с БД
+(OperationalError, InterfaceError) или превышение DEGRADED_DB_BUDGET
+секунд засчитывается как сбой, после
+DEGRADED_FAILURE_THRESHOLD сбоев подряд автомат размыкается на
+DEGRADED_COOLDOWN секунд. Затем один пробный запрос проверяет БД.
+Запрос, не обращавшийся к БД, ничего о ней не говорит: он не сбрасывает
+счетчик сбоев и не замыкает автомат.
+
+Пока автомат разомкнут (или если запрос упал со сбоем БД), страницы
+лент и постов (view с декоратором keep_last_good) отдаются из последней
+удачной отрисовки с баннером и дырами, заполненными как для анонима.
+Запись и остальные страницы получают 503 с Retry-After: без БД нельзя
+даже узнать пользователя по сессии, поэтому поставить запись в очередь
+негде. IntegrityError, DataError и прочие ошибки запроса - ошибки
+приложения, а не недоступность БД: они остаются обычным ответом 500.
+'''
+import logging
+import sys
+import threading
+import time
+from functools import wraps
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.signals import got_request_exception
+from django.db import InterfaceError, OperationalError, connection
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.shortcuts import render
+
+from . import holes
+from .conf import setting
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    '''Замкнут - запросы идут к БД; разомкнут - нет; по истечении паузы
+    пропускает один пробный запрос'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return 0
+        cooldown = setting('DEGRADED_COOLDOWN')
+        return max(1, int(self.opened_at + cooldown - time.monotonic()))
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            cooldown = setting('DEGRADED_COOLDOWN')
+            if self.trial or time.monotonic() < self.opened_at + cooldown:
+                return False
+            self.trial = True
+            return True
+
+    def skip(self):
+        '''Запрос без обращений к БД: пробным будет следующий'''
+        with self._lock:
+            self.trial = False
+
+    def success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logger.warning('Database is back, leaving degraded mode')
+            self.reset()
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            threshold = setting('DEGRADED_FAILURE_THRESHOLD')
+            if self.trial or (self.opened_at is None
+                              and self.failures >= threshold):
+                logger.warning('Database failing, degraded mode for %s s',
+                               setting('DEGRADED_COOLDOWN'))
+                self.opened_at = time.monotonic()
+                self.trial = False
+
+
+breaker = CircuitBreaker()
+
+
+class QueryTimer:
+    '''execute_wrapper, считающий запросы к БД и их суммарное время'''
+
+    def __init__(self):
+        self.queries = 0
+        self.elapsed = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.elapsed += time.monotonic() - start
+
+
+@receiver(got_request_exception, dispatch_uid='posts.degraded')
+def mark_database_error(sender, request=None, **kwargs):
+    '''Django превращает исключения в ответ 500 внутри цепочки
+    middleware, поэтому сбой БД отмечаем на запросе'''
+    if request is not None and isinstance(sys.exc_info()[1],
+                                          (OperationalError, InterfaceError)):
+        request.database_error = True
+
+
+def cache():
+    return caches[setting('DEGRADED_CACHE')]
+
+
+def page_key(request):
+    return f'degraded:page:{holes.page_path(request)}'
+
+
+def keep_last_good(view):
+    '''Сохраняет удачную отрисовку страницы (с незаполненными дырами)
+    на случай недоступности БД, не чаще раза в DEGRADED_REFRESH секунд'''
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if (request.method == 'GET' and response.status_code == 200
+                and not response.streaming):
+            key = page_key(request)
+            if cache().add(f'{key}:fresh', 1,
+                           setting('DEGRADED_REFRESH')):
+                cache().set(key, response.content,
+                            setting('DEGRADED_PAGE_TIMEOUT'))
+        return response
+    return wrapped
+
+
+def degraded_response(request):
+    '''Последняя удачная отрисовка страницы или 503'''
+    # Сессии в БД: без нее показываем страницу как анониму
+    request.user = AnonymousUser()
+    request.degraded = True
+    retry_after = str(breaker.retry_after() or setting('DEGRADED_COOLDOWN'))
+    content = None
+    if request.method in ('GET', 'HEAD'):
+        content = cache().get(page_key(request))
+    if content is not None:
+        response = HttpResponse(holes.fill(request, content.decode()))
+    else:
+        response = render(request, 'misc/503.html', {
+            'write': request.method not in ('GET', 'HEAD'),
+            'retry_after': retry_after,
+        }, status=503)
+        response.content = holes.fill(request, response.content.decode())
+        response['Retry-After'] = retry_after
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+class DegradedModeMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not setting('DEGRADED_MODE_ENABLED'):
+            return self.get_response(request)
+        if not breaker.allow():
+            return degraded_response(request)
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        if getattr(request, 'database_error', False):
+            breaker.failure()
+            return degraded_response(request)
+        if not timer.queries:
+            breaker.skip()
+        elif timer.elapsed > setting('DEGRADED_DB_BUDGET'):
+            logger.warning('Slow database: %.2f s of queries for %s',
+                           timer.elapsed, request.path)
+            breaker.failure()
+        else:
+            breaker.success()
+        return response
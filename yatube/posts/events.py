@@ -0,0 +1,154 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+from django.template.loader import render_to_string
+
+from .conf import setting
+
+
+class PostEvent:
+    '''Уведомление о новом посте, которое уходит подписчикам потока'''
+
+    def __init__(self, post_id, channels, data):
+        self.id = post_id
+        self.channels = frozenset(channels)
+        self.data = data
+
+    def encode(self, personalize=None):
+        data = self.data
+        if personalize is not None:
+            data = dict(data, html=personalize(data['html']))
+        payload = json.dumps(data, ensure_ascii=False)
+        return f'id: {self.id}\nevent: post\ndata: {payload}\n\n'
+
+
+class Subscription:
+    '''Один открытый поток: набор каналов и очередь событий'''
+
+    def __init__(self, broker, channels):
+        self.broker = broker
+        self.channels = frozenset(channels)
+        self.queue = queue.Queue(maxsize=setting(
+            'POSTS_STREAM_QUEUE_SIZE'))
+
+    def close(self):
+        '''Освобождает место в лимите потоков; повторный вызов безопасен'''
+        self.broker.unsubscribe(self)
+
+    def matches(self, event):
+        return not self.channels.isdisjoint(event.channels)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Медленный клиент догонит пропущенное через Last-Event-ID
+            pass
+
+
+class PostBroker:
+    '''Pub/sub внутри процесса: раздает новые посты открытым потокам
+    и хранит последние события для переподключения'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._backlog = deque(maxlen=setting('POSTS_STREAM_BACKLOG'))
+
+    def subscribe(self, channels):
+        '''Возвращает подписку или None, если лимит потоков исчерпан'''
+        limit = setting('POSTS_STREAM_MAX_CONNECTIONS')
+        with self._lock:
+            if len(self._subscribers) >= limit:
+                return None
+            subscription = Subscription(self, channels)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event):
+        with self._lock:
+            self._backlog.append(event)
+            subscribers = [s for s in self._subscribers if s.matches(event)]
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def replay(self, subscription, last_event_id):
+        '''События из буфера, пропущенные клиентом после last_event_id'''
+        with self._lock:
+            backlog = list(self._backlog)
+        return [event for event in backlog
+                if event.id > last_event_id and subscription.matches(event)]
+
+    @property
+    def connections(self):
+        return len(self._subscribers)
+
+
+broker = PostBroker()
+
+
+def index_channel():
+    return 'index'
+
+
+def group_channel(slug):
+    return f'group:{slug}'
+
+
+def author_channel(author_id):
+    return f'author:{author_id}'
+
+
+def post_event(post):
+    '''Собирает событие для нового поста вместе с готовой карточкой'''
+    channels = [index_channel(), author_channel(post.author_id)]
+    group_slug = None
+    if post.group_id is not None:
+        group_slug = post.group.slug
+        channels.append(group_channel(group_slug))
+    data = {
+        'id': post.pk,
+        'author': post.author.username,
+        'group': group_slug,
+        'html': render_to_string('includes/post_item.html', {'post': post}),
+    }
+    return PostEvent(post.pk, channels, data)
+
+
+def stream_events(subscription, last_event_id=None, personalize=None):
+    '''Генератор тела ответа text/event-stream.
+
+    Поток живет не дольше POSTS_STREAM_TIMEOUT секунд, после чего клиент
+    переподключается сам и получает пропущенное по Last-Event-ID.
+    personalize(html) заполняет в карточке персональные фрагменты.'''
+    heartbeat = setting('POSTS_STREAM_HEARTBEAT')
+    deadline = time.monotonic() + setting('POSTS_STREAM_TIMEOUT')
+    try:
+        yield f'retry: {setting("POSTS_STREAM_RETRY")}\n\n'
+        if last_event_id is not None:
+            for event in broker.replay(subscription, last_event_id):
+                last_event_id = event.id
+                yield event.encode(personalize)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                event = subscription.queue.get(
+                    timeout=min(heartbeat, remaining))
+            except queue.Empty:
+                yield ': heartbeat\n\n'
+                continue
+            # Событие могло уже уйти клиенту при воспроизведении буфера
+            if last_event_id is not None and event.id <= last_event_id:
+                continue
+            yield event.encode(personalize)
+    finally:
+        subscription.close()
@@ -0,0 +1,77 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Колонки выгрузки: имя в файле -> поле для values_list
+EXPORT_FIELDS = {
+    'post': {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'pub_date': 'pub_date',
+        'text': 'text',
+        'image': 'image',
+        'views': 'views',
+    },
+    'comment': {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'created': 'created',
+        'text': 'text',
+    },
+    'follow': {
+        'id': 'id',
+        'user': 'user__username',
+        'author': 'author__username',
+    },
+}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class Echo:
+    '''Псевдо-файл для csv.writer: строка сразу отдается в ответ'''
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset):
+    '''Строки выгрузки кортежами, без создания моделей и без загрузки
+    всей выборки в память'''
+    fields = EXPORT_FIELDS[queryset.model._meta.model_name]
+    return queryset.order_by('pk').values_list(*fields.values()).iterator(
+        chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def csv_lines(queryset):
+    fields = EXPORT_FIELDS[queryset.model._meta.model_name]
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in export_rows(queryset):
+        yield writer.writerow(row)
+
+
+def ndjson_lines(queryset):
+    fields = list(EXPORT_FIELDS[queryset.model._meta.model_name])
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in export_rows(queryset):
+        yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+def export_response(queryset, export_format):
+    '''StreamingHttpResponse с выгрузкой queryset в CSV или NDJSON'''
+    lines = csv_lines if export_format == 'csv' else ndjson_lines
+    response = StreamingHttpResponse(lines(queryset),
+                                     content_type=CONTENT_TYPES[export_format])
+    name = queryset.model._meta.model_name
+    response['Content-Disposition'] = (
+        f'attachment; filename="{name}s.{export_format}"')
+    return response
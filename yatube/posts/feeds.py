@@ -0,0 +1,186 @@
+'''
+RSS и Atom для главной ленты, групп и авторов.
+
+Ленты - обычные django.contrib.syndication.Feed по тем же запросам, что
+и страницы (посты по -pub_date, авторы и группы через identity map).
+conditional() оборачивает ленту проверкой условного запроса до сборки
+XML: ETag считается по последнему посту ленты (один запрос по индексу
+pub_date) и версии этой ленты. Версия своя у главной ленты, каждой
+группы и каждого автора; ее значение - время последнего изменения, и
+сигналы поднимают только версии лент, которых изменение касается: пост
+- главной, его автора и группы (старой и новой), группа - своей,
+переименование автора - его ленты, главной и групп с его постами.
+Last-Modified - позднейшее из pub_date последнего поста и времени
+версии, так что правка поста видна и клиентам с If-Modified-Since.
+Неизменившаяся лента отвечает 304, а XML изменившейся берется из кэша
+по тому же ETag и собирается только первым запросом после изменения.
+'''
+import hashlib
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, quote_etag
+from django.utils.text import Truncator
+from django.views.decorators.http import require_safe
+
+from . import identity
+from .conf import setting
+from .models import Group, Post
+
+User = get_user_model()
+
+
+def version_key(scope):
+    return f'feeds:version:{scope}'
+
+
+def bump(*scopes):
+    '''Сбрасывает ETag и XML лент scopes (index, group:<pk>, author:<pk>)'''
+    changed = time.time()
+    cache.set_many({version_key(scope): changed for scope in scopes}, None)
+
+
+class PostFeed(Feed):
+    '''Общая часть лент: посты queryset(obj), новые первыми'''
+
+    def queryset(self, obj):
+        return Post.objects.all()
+
+    def scope(self, obj):
+        '''Версия, которую поднимают изменения этой ленты'''
+        return 'index'
+
+    def newest(self, obj):
+        '''(pk, pub_date) последнего поста ленты или None'''
+        return self.queryset(obj).values_list('pk', 'pub_date').first()
+
+    def items(self, obj):
+        posts = list(self.queryset(obj)[:setting('FEED_ITEMS')])
+        identity.attach(posts, 'author', 'group')
+        return posts
+
+    def item_title(self, item):
+        return Truncator(item.text).chars(60)
+
+    def item_description(self, item):
+        return item.body
+
+    def item_link(self, item):
+        return reverse('post', args=[item.author.username, item.pk])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_author_name(self, item):
+        return item.author.username
+
+    def item_author_link(self, item):
+        return reverse('profile', args=[item.author.username])
+
+
+class IndexFeed(PostFeed):
+    title = 'Yatube: последние обновления'
+    description = 'Последние посты на сайте'
+
+    def link(self):
+        return reverse('index')
+
+
+class GroupFeed(PostFeed):
+    def get_object(self, request, slug):
+        try:
+            return identity.lookup(Group, slug=slug)
+        except Group.DoesNotExist:
+            raise Http404
+
+    def queryset(self, obj):
+        return obj.posts.all()
+
+    def scope(self, obj):
+        return f'group:{obj.pk}'
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('group_posts', args=[obj.slug])
+
+
+class AuthorFeed(PostFeed):
+    def get_object(self, request, username):
+        try:
+            return identity.lookup(User, username=username)
+        except User.DoesNotExist:
+            raise Http404
+
+    def queryset(self, obj):
+        return obj.posts.all()
+
+    def scope(self, obj):
+        return f'author:{obj.pk}'
+
+    def title(self, obj):
+        return f'Yatube: @{obj.username}'
+
+    def description(self, obj):
+        return f'Посты {obj.get_full_name() or obj.username}'
+
+    def link(self, obj):
+        return reverse('profile', args=[obj.username])
+
+
+def atom(feed_class):
+    '''Та же лента в формате Atom'''
+    return type(f'Atom{feed_class.__name__}', (feed_class,), {
+        'feed_type': Atom1Feed,
+        'subtitle': feed_class.description,
+    })
+
+
+def conditional(feed_class):
+    '''View ленты с ответом 304 и кэшем XML по ETag'''
+    @require_safe
+    def view(request, **kwargs):
+        feed = feed_class()
+        obj = feed.get_object(request, **kwargs)
+        newest = feed.newest(obj)
+        changed = cache.get(version_key(feed.scope(obj)), 0)
+        tag = quote_etag(hashlib.md5('{}:{}:{}:{}'.format(
+            feed_class.__name__, sorted(kwargs.items()), newest,
+            changed).encode()).hexdigest())
+        last_modified = int(max(newest[1].timestamp() if newest else 0,
+                                changed)) or None
+        response = get_conditional_response(
+            request, etag=tag, last_modified=last_modified)
+        if response is None:
+            key = f'feeds:body:{request.get_host()}:{tag}'
+            cached = cache.get(key)
+            if cached is None:
+                rendered = feed(request, **kwargs)
+                cached = (rendered.content, rendered['Content-Type'])
+                cache.set(key, cached, setting('FEED_CACHE_TIMEOUT'))
+            response = HttpResponse(cached[0], content_type=cached[1])
+        response['ETag'] = tag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'public, max-age={}'.format(
+            setting('FEED_MAX_AGE'))
+        return response
+    return view
+
+
+index_rss = conditional(IndexFeed)
+index_atom = conditional(atom(IndexFeed))
+group_rss = conditional(GroupFeed)
+group_atom = conditional(atom(GroupFeed))
+author_rss = conditional(AuthorFeed)
+author_atom = conditional(atom(AuthorFeed))
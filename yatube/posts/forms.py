@@ -8,6 +8,11 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ['group', 'text', 'image']
 
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            self.instance.read_image_meta()
+        return super().save(commit)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,200 @@
+'''
+Персональные "дыры" в общих страницах (hole punching).
+
+Шаблоны страниц не обращаются к user напрямую: все, что зависит от
+пользователя (nav.html, кнопки поста, форма комментария с CSRF-токеном,
+кнопка подписки), выводится тегом {% hole 'имя' аргументы %} как маркер
+<!--hole:имя:аргументы-->. Такой HTML одинаков для всех и кэшируется
+целиком (shared_page), а HolePunchMiddleware на каждом запросе заменяет
+маркеры небольшими шаблонами, отрендеренными для текущего пользователя.
+
+Ключ общей страницы содержит версии того, что она показывает:
+user:<username> - карточка автора (имя, число постов и подписчиков),
+posts:<username> - посты профиля, post:<pk> - пост и его комментарии.
+Сигналы поднимают версии только измененных объектов, поэтому новый
+комментарий сбрасывает страницу своего поста и профиль его автора, а не
+все общие страницы.
+'''
+import hashlib
+import re
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template import RequestContext, engines
+
+from . import singleflight
+from .conf import incr, setting
+from .forms import CommentForm
+from .models import Follow, Post
+
+HOLE = re.compile(r'<!--hole:([a-z_]+)((?::[^:>]*)*)-->')
+
+
+def marker(name, *args):
+    return '<!--hole:{}-->'.format(':'.join([name, *map(str, args)]))
+
+
+def render(context, template_name, **values):
+    template = engines['django'].engine.get_template(template_name)
+    with context.push(**values):
+        return template.render(context)
+
+
+def nav(context):
+    return render(context, 'nav.html')
+
+
+def degraded_banner(context):
+    if not getattr(context.request, 'degraded', False):
+        return ''
+    return render(context, 'includes/degraded_banner.html')
+
+
+def post_actions(context, username, post_id, author_id):
+    return render(context, 'includes/post_actions.html', username=username,
+                  post_id=post_id, author_id=int(author_id))
+
+
+def comment_form(context, username, post_id):
+    return render(context, 'includes/comment_form.html', username=username,
+                  post_id=post_id, form=CommentForm())
+
+
+def follow_button(context, username):
+    user = context.request.user
+    following = (
+        user.is_authenticated
+        and Follow.objects.filter(user=user,
+                                  author__username=username).exists()
+    )
+    return render(context, 'includes/follow_button.html', username=username,
+                  following=following)
+
+
+HOLES = {
+    'nav': nav,
+    'degraded': degraded_banner,
+    'post_actions': post_actions,
+    'comment_form': comment_form,
+    'follow': follow_button,
+}
+
+
+def fill(request, content):
+    '''Заменяет маркеры в HTML фрагментами для request.user.
+
+    Все дыры рендерятся в одном RequestContext, поэтому context processors
+    выполняются один раз на запрос, а одинаковые маркеры - один раз.'''
+    markers = {match.group(0): match.groups()
+               for match in HOLE.finditer(content)}
+    if not markers:
+        return content
+    engine = engines['django'].engine
+    context = RequestContext(request)
+    rendered = {}
+    with context.bind_template(engine.from_string('')):
+        for text, (name, args) in markers.items():
+            args = args.split(':')[1:]
+            rendered[text] = HOLES[name](context, *args)
+    return HOLE.sub(lambda match: rendered[match.group(0)], content)
+
+
+class HolePunchMiddleware:
+    '''Заполняет дыры в HTML-ответах. Стоит после CsrfViewMiddleware:
+    токен, выданный дырой, успевает попасть в cookie.'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (response.streaming
+                or not response.get('Content-Type', '').startswith(
+                    'text/html')
+                or b'<!--hole:' not in response.content):
+            return response
+        response.content = fill(request,
+                                response.content.decode(response.charset))
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
+        return response
+
+
+def cache():
+    return caches[setting('SHARED_PAGE_CACHE')]
+
+
+def version_key(scope):
+    return f'holes:version:{scope}'
+
+
+def bump(*scopes):
+    '''Сбрасывает общие страницы scopes (user:<username>,
+    posts:<username>, post:<pk>)'''
+    for scope in scopes:
+        incr(cache(), version_key(scope))
+
+
+def post_scopes(post_ids):
+    '''Страницы постов post_ids и профили их авторов'''
+    scopes = set()
+    rows = Post.objects.filter(pk__in=post_ids).values_list(
+        'pk', 'author__username')
+    for pk, username in rows:
+        scopes.update((f'post:{pk}', f'posts:{username}'))
+    return scopes
+
+
+def user_scopes(user_ids):
+    '''Карточки пользователей user_ids'''
+    usernames = get_user_model().objects.filter(
+        pk__in=user_ids).values_list('username', flat=True)
+    return {f'user:{username}' for username in usernames}
+
+
+def page_path(request):
+    '''Путь и номер страницы ленты: прочие параметры запроса не
+    размножают копии страницы в кэше'''
+    page = request.GET.get('page', '')
+    page = int(page) if page.isdigit() else 1
+    return hashlib.md5(request.path.encode()).hexdigest() + f':{page}'
+
+
+def page_key(request, scopes):
+    keys = [version_key(scope) for scope in scopes]
+    stored = cache().get_many(keys)
+    versions = ':'.join(str(stored.get(key, 0)) for key in keys)
+    return f'holes:page:{versions}:{page_path(request)}'
+
+
+def shared_page(*scopes):
+    '''Кэширует общую для всех пользователей часть страницы (с
+    незаполненными дырами) и отдает ее без вызова view. scopes - шаблоны
+    версий страницы, заполняемые аргументами view ('post:{post_id}').
+    Истекшую страницу пересчитывает один запрос, остальные получают
+    прежнюю.'''
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            response = None
+
+            def compute():
+                nonlocal response
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    return response.content
+                return None
+
+            key = page_key(request, [scope.format(**kwargs)
+                                     for scope in scopes])
+            content = singleflight.get_or_compute(
+                cache(), key, compute, setting('SHARED_PAGE_TIMEOUT'))
+            if response is not None:
+                return response
+            return HttpResponse(content)
+        return wrapped
+    return decorator
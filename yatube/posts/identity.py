@@ -0,0 +1,199 @@
+'''
+Identity map на время запроса: каждая строка User/Group/Post загружается
+не больше одного раза, а все ссылки на нее (request.user, post.author,
+item.author в комментариях, author в профиле) указывают на один объект.
+
+Недостающие объекты берутся из кэша объектов (posts.objcache), а не
+напрямую из БД. Карта живет в thread-local и включается
+IdentityMapMiddleware; вне
+запроса (команды, тесты функций) функции модуля работают без
+кэширования, но так же группируют загрузку связанных объектов.
+'''
+import logging
+import threading
+
+from django.conf import settings
+
+from . import objcache
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+
+
+class IdentityMap:
+    def __init__(self):
+        self.objects = {}
+        # Обращения, обслуженные из карты вместо запроса к БД
+        self.hits = 0
+        # Запросы, которыми карта дозагружала недостающие объекты
+        self.queries = 0
+
+    def key(self, model, pk):
+        return model._meta.label_lower, pk
+
+    def get(self, model, pk):
+        instance = self.objects.get(self.key(model, pk))
+        if instance is not None:
+            self.hits += 1
+        return instance
+
+    def add(self, instance):
+        '''Возвращает объект из карты, если он уже был загружен'''
+        key = self.key(type(instance), instance.pk)
+        return self.objects.setdefault(key, instance)
+
+
+def current():
+    return getattr(_state, 'map', None)
+
+
+def activate():
+    _state.map = IdentityMap()
+    return _state.map
+
+
+def deactivate():
+    _state.map = None
+
+
+def add(instance):
+    identity_map = current()
+    if identity_map is None or instance is None:
+        return instance
+    return identity_map.add(instance)
+
+
+def get(model, pk, queryset=None):
+    '''Объект по первичному ключу: из карты или одним запросом'''
+    identity_map = current()
+    if identity_map is not None:
+        instance = identity_map.get(model, pk)
+        if instance is not None:
+            return instance
+        identity_map.queries += 1
+    if queryset is None and objcache.is_cached(model):
+        return add(objcache.get(model, pk))
+    queryset = model._default_manager.all() if queryset is None else queryset
+    return add(queryset.get(pk=pk))
+
+
+def lookup(model, queryset=None, **fields):
+    '''Объект по натуральному ключу (username, slug): сначала среди уже
+    загруженных в этом запросе, иначе одним запросом'''
+    identity_map = current()
+    if identity_map is not None:
+        label = model._meta.label_lower
+        for (key_label, pk), instance in identity_map.objects.items():
+            if key_label == label and all(
+                    getattr(instance, name) == value
+                    for name, value in fields.items()):
+                identity_map.hits += 1
+                return instance
+        identity_map.queries += 1
+    if queryset is None and objcache.is_cached(model):
+        return add(objcache.get(model, **fields))
+    queryset = model._default_manager.all() if queryset is None else queryset
+    return add(queryset.get(**fields))
+
+
+def get_many(model, pks):
+    '''Словарь pk -> объект: из карты, недостающие одним запросом'''
+    identity_map = current()
+    loaded = {}
+    missing = set()
+    for pk in pks:
+        instance = (identity_map.get(model, pk)
+                    if identity_map is not None else None)
+        if instance is not None:
+            loaded[pk] = instance
+        else:
+            missing.add(pk)
+    if missing:
+        if identity_map is not None:
+            identity_map.queries += 1
+        if objcache.is_cached(model):
+            found = objcache.get_many(model, missing)
+        else:
+            found = model._default_manager.in_bulk(missing)
+        for pk, instance in found.items():
+            loaded[pk] = add(instance)
+    return loaded
+
+
+def attach(objects, *names):
+    '''Заполняет внешние ключи names у objects объектами из карты,
+    недостающие загружает одним запросом на поле. Возвращает objects
+    списком (queryset при этом вычисляется и сохраняет свой кэш).'''
+    objects = list(objects)
+    for name in names:
+        if not objects:
+            break
+        field = objects[0]._meta.get_field(name)
+        pks = {getattr(obj, field.attname) for obj in objects}
+        pks.discard(None)
+        loaded = get_many(field.related_model, pks)
+        for obj in objects:
+            pk = getattr(obj, field.attname)
+            if pk in loaded:
+                field.set_cached_value(obj, loaded[pk])
+    return objects
+
+
+class Attached:
+    '''Ленивая последовательность для Page.object_list: выборка и attach
+    выполняются при первом обращении, поэтому закэшированный фрагмент
+    шаблона по-прежнему обходится без запроса за постами'''
+
+    def __init__(self, queryset, *names):
+        self.queryset = queryset
+        self.names = names
+        self._objects = None
+
+    @property
+    def objects(self):
+        if self._objects is None:
+            self._objects = attach(self.queryset, *self.names)
+        return self._objects
+
+    def __iter__(self):
+        return iter(self.objects)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __getitem__(self, index):
+        return self.objects[index]
+
+
+class IdentityMapMiddleware:
+    '''Включает identity map на время запроса и очищает ее в конце,
+    чтобы объекты не переходили между запросами.
+
+    Подключается после AuthenticationMiddleware: request.user сразу
+    попадает в карту. С DEBUG в ответ добавляется заголовок
+    X-Identity-Map с числом сэкономленных и выполненных запросов.'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        identity_map = activate()
+        try:
+            user = getattr(request, 'user', None)
+            # Файлы медиа и статики не зависят от пользователя: обращение
+            # к сессии добавило бы им Vary: Cookie
+            if (user is not None
+                    and not request.path.startswith(
+                        (settings.MEDIA_URL, settings.STATIC_URL))
+                    and user.is_authenticated):
+                add(user._wrapped if hasattr(user, '_wrapped') else user)
+            response = self.get_response(request)
+        finally:
+            deactivate()
+        logger.debug('identity map %s: %d hits, %d queries', request.path,
+                     identity_map.hits, identity_map.queries)
+        if settings.DEBUG:
+            response['X-Identity-Map'] = (
+                f'hits={identity_map.hits}; queries={identity_map.queries}')
+        return response
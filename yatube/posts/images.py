@@ -0,0 +1,43 @@
+'''
+Сведения об изображениях постов, которые иначе пришлось бы узнавать,
+открывая файл при отрисовке: размеры, формат, размер файла и средний
+цвет для заглушки.
+'''
+from PIL import Image
+
+# Размер, до которого изображение уменьшается перед подсчетом цвета;
+# для JPEG декодер сразу читает уменьшенную копию (draft)
+COLOR_SAMPLE_SIZE = 64
+
+
+def image_metadata(file):
+    '''Словарь width, height, format, size, color для файла изображения'''
+    file.open('rb')
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            width, height = image.size
+            image_format = (image.format or '').lower()
+            color = average_color(image)
+    finally:
+        # Загруженный файл будет сохранен в хранилище с начала
+        file.seek(0)
+    return {
+        'width': width,
+        'height': height,
+        'format': image_format,
+        'size': file.size,
+        'color': color,
+    }
+
+
+def average_color(image):
+    '''Средний цвет '#rrggbb' или пустая строка, если изображение не
+    декодируется целиком (поврежденный файл проходит проверку формы)'''
+    try:
+        image.thumbnail((COLOR_SAMPLE_SIZE, COLOR_SAMPLE_SIZE))
+        color = image.convert('RGB').resize((1, 1), Image.BOX)
+    except OSError:
+        return ''
+    red, green, blue = color.getpixel((0, 0))
+    return f'#{red:02x}{green:02x}{blue:02x}'
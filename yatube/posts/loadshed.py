@@ -0,0 +1,147 @@
+'''
+Сброс нагрузки (load shedding) на уровне воркера.
+
+LoadSheddingMiddleware считает запросы, которые воркер обрабатывает
+прямо сейчас, и время ожидания запроса в очереди перед воркером
+(заголовок X-Request-Start от nginx: "t=<секунды>"). Когда порог для
+приоритета запроса превышен, запрос сразу получает 503 с Retry-After,
+не доходя до сессий и БД. Пороги - settings.LOAD_SHEDDING_LIMITS.
+
+Приоритеты:
+* low - пути из LOAD_SHEDDING_LOW_PRIORITY_PATHS (страницы /about/,
+  выгрузки админки) и анонимные страницы ленты дальше
+  LOAD_SHEDDING_DEEP_PAGE;
+* normal - остальные анонимные GET;
+* high - запись и запросы вошедших пользователей; не сбрасываются.
+
+Вошедшего пользователя узнаем без БД по подписанной cookie
+LOAD_SHEDDING_COOKIE, которую ставит вход на сайт и удаляет выход.
+Cookie сессии сама по себе приоритета не дает: ее может прислать кто
+угодно, а проверить ее можно только запросом к хранилищу сессий.
+
+Синхронный воркер обрабатывает один запрос за раз, для него работает
+только порог ожидания в очереди; порог одновременных запросов нужен
+многопоточным воркерам.
+'''
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from .conf import setting
+
+logger = logging.getLogger(__name__)
+
+SALT = 'posts.loadshed'
+
+
+@receiver(user_logged_in, dispatch_uid='posts.loadshed.login')
+def mark_logged_in(sender, request=None, **kwargs):
+    if request is not None:
+        request.priority_cookie = True
+
+
+@receiver(user_logged_out, dispatch_uid='posts.loadshed.logout')
+def mark_logged_out(sender, request=None, **kwargs):
+    if request is not None:
+        request.priority_cookie = False
+
+
+def has_priority_cookie(request):
+    return request.get_signed_cookie(
+        setting('LOAD_SHEDDING_COOKIE'), default=None, salt=SALT,
+        max_age=settings.SESSION_COOKIE_AGE) is not None
+
+
+def update_priority_cookie(request, response):
+    '''Ставит cookie после входа и удаляет после выхода'''
+    logged_in = getattr(request, 'priority_cookie', None)
+    name = setting('LOAD_SHEDDING_COOKIE')
+    if logged_in:
+        response.set_signed_cookie(
+            name, '1', salt=SALT, max_age=settings.SESSION_COOKIE_AGE,
+            secure=settings.SESSION_COOKIE_SECURE or None, httponly=True,
+            samesite=settings.SESSION_COOKIE_SAMESITE)
+    elif logged_in is not None:
+        response.delete_cookie(name)
+    return response
+
+
+def low_priority_paths():
+    return [re.compile(pattern)
+            for pattern in setting('LOAD_SHEDDING_LOW_PRIORITY_PATHS')]
+
+
+def request_priority(request, low_paths):
+    if request.method in ('GET', 'HEAD'):
+        if any(pattern.match(request.path_info) for pattern in low_paths):
+            return 'low'
+    else:
+        return 'high'
+    if has_priority_cookie(request):
+        return 'high'
+    page = request.GET.get('page', '')
+    if page.isdigit() and int(page) > setting('LOAD_SHEDDING_DEEP_PAGE'):
+        return 'low'
+    return 'normal'
+
+
+def queue_wait(request):
+    '''Секунды с момента, когда запрос принял балансировщик'''
+    header = request.META.get('HTTP_X_REQUEST_START', '')
+    try:
+        started = float(header[2:] if header.startswith('t=') else header)
+    except ValueError:
+        return 0
+    return max(0, time.time() - started)
+
+
+class LoadSheddingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.low_paths = low_priority_paths()
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        # Сброшенные запросы по приоритетам
+        self.shed = Counter()
+
+    def should_shed(self, priority, wait):
+        limits = setting('LOAD_SHEDDING_LIMITS').get(priority)
+        if not limits:
+            return False
+        return (self.in_flight >= limits.get('in_flight', float('inf'))
+                or wait > limits.get('queue_wait', float('inf')))
+
+    def __call__(self, request):
+        if not setting('LOAD_SHEDDING_ENABLED'):
+            return update_priority_cookie(request,
+                                          self.get_response(request))
+        priority = request_priority(request, self.low_paths)
+        wait = queue_wait(request)
+        with self.lock:
+            shed = self.should_shed(priority, wait)
+            if shed:
+                self.shed[priority] += 1
+            else:
+                self.in_flight += 1
+        if shed:
+            logger.info('Shed %s request %s: %d in flight, %.2f s queued',
+                        priority, request.path, self.in_flight, wait)
+            retry_after = setting('LOAD_SHEDDING_RETRY_AFTER')
+            response = HttpResponse('Сервер перегружен, повторите позже',
+                                    status=503,
+                                    content_type='text/plain; charset=utf-8')
+            response['Retry-After'] = str(retry_after)
+            return response
+        try:
+            return update_priority_cookie(request,
+                                          self.get_response(request))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
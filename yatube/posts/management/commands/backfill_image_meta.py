@@ -0,0 +1,56 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from posts.images import image_metadata
+from posts.models import Post
+
+logger = logging.getLogger(__name__)
+
+META_FIELDS = ['image_width', 'image_height', 'image_format', 'image_size',
+               'image_color']
+
+
+def read_meta(pk, name):
+    '''Post с заполненными сведениями или None, если файл не читается'''
+    try:
+        with default_storage.open(name, 'rb') as file:
+            meta = image_metadata(file)
+    except Exception:
+        logger.exception('Cannot read image %s of post %s', name, pk)
+        return None
+    return Post(pk=pk, image_width=meta['width'],
+                image_height=meta['height'], image_format=meta['format'],
+                image_size=meta['size'], image_color=meta['color'])
+
+
+class Command(BaseCommand):
+    help = ('Заполняет сведения об изображениях постов, загруженных до их '
+            'появления: файлы читаются параллельно, запись пачками')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--chunk-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None).filter(
+            image_width=None).order_by('pk')
+        last_pk = 0
+        total = failed = 0
+        with ThreadPoolExecutor(options['workers']) as pool:
+            while True:
+                chunk = list(posts.filter(pk__gt=last_pk).values_list(
+                    'pk', 'image')[:options['chunk_size']])
+                if not chunk:
+                    break
+                last_pk = chunk[-1][0]
+                # Чтение и декодирование файлов - в потоках, запись в БД -
+                # одним запросом на пачку из основного потока
+                results = list(pool.map(lambda row: read_meta(*row), chunk))
+                updated = [post for post in results if post is not None]
+                Post.objects.bulk_update(updated, META_FIELDS)
+                total += len(updated)
+                failed += len(results) - len(updated)
+                self.stdout.write(f'Обработано: {total}, ошибок: {failed}')
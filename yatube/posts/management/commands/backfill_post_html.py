@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post, render_text
+
+
+class Command(BaseCommand):
+    help = ('Заполняет готовый HTML текста и анонса у постов, сохраненных '
+            'до его появления, пачками по --chunk-size')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--all', action='store_true',
+                            help='Пересчитать и уже заполненные посты '
+                                 '(после изменения EXCERPT_LENGTH)')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.order_by('pk')
+        if not options['all']:
+            posts = posts.filter(text_html='')
+        last_pk = 0
+        total = 0
+        while True:
+            # По pk, а не со смещением: обработанные посты выпадают из
+            # выборки text_html=''
+            chunk = list(posts.filter(pk__gt=last_pk).values_list(
+                'pk', 'text')[:options['chunk_size']])
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+            updated = []
+            for pk, text in chunk:
+                text_html, excerpt_html = render_text(text)
+                updated.append(Post(pk=pk, text_html=text_html,
+                                    excerpt_html=excerpt_html))
+            Post.objects.bulk_update(updated, ['text_html', 'excerpt_html'])
+            total += len(updated)
+            self.stdout.write(f'Обработано постов: {total}')
@@ -0,0 +1,78 @@
+import os
+import re
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+
+from posts.models import Post
+
+User = get_user_model()
+
+# Включения, которые обернуты в {% spaceless %}
+SPACELESS_TEMPLATES = ('includes/post_item.html', 'paginator.html')
+SPACELESS_TAGS = re.compile(r'{%\s*(end)?spaceless\s*%}\n?')
+
+
+def templates(spaceless):
+    '''TEMPLATES, где включения карточки и пагинатора взяты без
+    {% spaceless %}, если spaceless=False'''
+    options = dict(settings.TEMPLATES[0]['OPTIONS'])
+    if not spaceless:
+        sources = {}
+        for name in SPACELESS_TEMPLATES:
+            with open(os.path.join(settings.TEMPLATES_DIR, name)) as file:
+                sources[name] = SPACELESS_TAGS.sub('', file.read())
+        options['loaders'] = [
+            ('django.template.loaders.locmem.Loader', sources),
+        ] + list(settings.TEMPLATE_LOADERS)
+    return [dict(settings.TEMPLATES[0], OPTIONS=options)]
+
+
+class Command(BaseCommand):
+    help = ('Размер и время главной страницы с 10 карточками: с '
+            '{% spaceless %} в карточке и пагинаторе и без, со сжатием '
+            'CompressionMiddleware и без. Время передачи считается для '
+            'канала --bandwidth Мбит/с. Пишет в БД, данные откатываются')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=30)
+        parser.add_argument('--bandwidth', type=float, default=10)
+
+    def handle(self, *args, **options):
+        # Кэш фрагментов и страниц выключен: меряем рендер, а не кэш
+        dummy_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with override_settings(CACHES=dummy_cache), transaction.atomic():
+            author = User.objects.create(username='bench_compression')
+            Post.objects.bulk_create(
+                Post(author=author, text=f'Текст поста {i}\n' * 5)
+                for i in range(30))
+            self.stdout.write(f'{"spaceless":>9} {"gzip":>5} {"bytes":>7} '
+                              f'{"server ms":>9} {"transfer ms":>11}')
+            for spaceless in (False, True):
+                with override_settings(TEMPLATES=templates(spaceless)):
+                    for compressed in (False, True):
+                        size, ms = self.measure(compressed,
+                                                options['repeat'])
+                        transfer = size * 8 / (options['bandwidth'] * 1000)
+                        self.stdout.write(
+                            f'{str(spaceless):>9} {str(compressed):>5} '
+                            f'{size:>7} {ms:>9.2f} {transfer:>11.2f}')
+            transaction.set_rollback(True)
+
+    def measure(self, compressed, repeat):
+        '''Размер ответа и медиана времени запроса главной страницы'''
+        client = Client(HTTP_ACCEPT_ENCODING='gzip' if compressed else '')
+        # Первый запрос компилирует шаблоны
+        client.get('/')
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = client.get('/')
+            timings.append(time.perf_counter() - start)
+        return len(response.content), statistics.median(timings) * 1000
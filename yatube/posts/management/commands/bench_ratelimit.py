@@ -0,0 +1,47 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from posts.ratelimit import ratelimit
+
+
+@ratelimit('bench')
+def limited_view(request):
+    return HttpResponse()
+
+
+def plain_view(request):
+    return HttpResponse()
+
+
+class Command(BaseCommand):
+    help = ('Накладные расходы ограничителя частоты на один запрос: '
+            'view с @ratelimit против того же view без него')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+        request.user = AnonymousUser()
+        # Лимит заведомо не достигается: меряем обычный путь запроса
+        limits = {'bench': {'ip': f'{options["requests"] * 10}/h'}}
+        with override_settings(RATELIMITS=limits):
+            plain = self.measure(plain_view, request, options['requests'])
+            limited = self.measure(limited_view, request,
+                                   options['requests'])
+        self.stdout.write(f'без лимита:   {plain:8.2f} us/запрос')
+        self.stdout.write(f'с @ratelimit: {limited:8.2f} us/запрос')
+        self.stdout.write(f'накладные:    {limited - plain:8.2f} us/запрос')
+
+    def measure(self, view, request, count):
+        timings = []
+        for _ in range(count):
+            start = time.perf_counter()
+            view(request)
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings) * 1_000_000
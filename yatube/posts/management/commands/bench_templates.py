@@ -0,0 +1,106 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.template import Engine, RequestContext
+from django.template.backends.django import get_installed_libraries
+from django.test import RequestFactory, override_settings
+
+from posts.models import Post
+
+User = get_user_model()
+
+# Лента в том виде, как она была до {% post_cards %}: include на каждый пост
+NESTED_FEED = '''{% extends "base.html" %}
+{% block content %}
+{% for post in page %}
+  {% include "includes/post_item.html" with post=post %}
+{% endfor %}
+{% include "paginator.html" %}
+{% endblock %}'''
+
+FLAT_FEED = '''{% extends "base.html" %}
+{% load post_tags %}
+{% block content %}
+{% post_cards page %}
+{% include "paginator.html" %}
+{% endblock %}'''
+
+LOADERS = [
+    ('django.template.loaders.locmem.Loader', {
+        'bench/nested.html': NESTED_FEED,
+        'bench/flat.html': FLAT_FEED,
+    }),
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+VARIANTS = {
+    'nested': 'bench/nested.html',
+    'flat': 'bench/flat.html',
+    'index.html': 'index.html',
+}
+
+
+class Command(BaseCommand):
+    help = ('Замер времени рендера ленты (index.html) на 10/50/100 постах: '
+            'include на каждую карточку против {% post_cards %}, '
+            'с обычными и кэширующими загрузчиками шаблонов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, nargs='+',
+                            default=[10, 50, 100])
+        parser.add_argument('--repeat', type=int, default=30)
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        # Кэш фрагментов выключен, иначе меряем только чтение из кэша
+        dummy_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with override_settings(CACHES=dummy_cache), transaction.atomic():
+            author = User.objects.create(username='bench_templates')
+            Post.objects.bulk_create(
+                Post(author=author, text='Текст поста\n' * 5)
+                for _ in range(max(options['posts']))
+            )
+            self.stdout.write(f'{"posts":>5} {"loader":>7} '
+                              f'{"variant":>10} {"ms/render":>10}')
+            for count in options['posts']:
+                posts = list(Post.objects.select_related(
+                    'author', 'group').filter(author=author)[:count])
+                page = Paginator(posts, count).get_page(1)
+                for cached in (False, True):
+                    engine = self.engine(cached)
+                    for name, template_name in VARIANTS.items():
+                        ms = self.measure(engine, template_name, request,
+                                          page, options['repeat'])
+                        loader = 'cached' if cached else 'default'
+                        self.stdout.write(f'{count:>5} {loader:>7} '
+                                          f'{name:>10} {ms:>10.2f}')
+            transaction.set_rollback(True)
+
+    def engine(self, cached):
+        options = settings.TEMPLATES[0]['OPTIONS']
+        loaders = [('django.template.loaders.cached.Loader', LOADERS)]
+        return Engine(
+            dirs=settings.TEMPLATES[0]['DIRS'],
+            loaders=loaders if cached else LOADERS,
+            context_processors=options['context_processors'],
+            libraries=get_installed_libraries(),
+        )
+
+    def measure(self, engine, template_name, request, page, repeat):
+        '''Медиана времени get_template + render, как во view'''
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            template = engine.get_template(template_name)
+            template.render(RequestContext(request, {'page': page}))
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings) * 1000
@@ -0,0 +1,116 @@
+import shutil
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.template import Context, Engine
+from django.template.backends.django import get_installed_libraries
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.functional import empty
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.kvstores import cached_db_kvstore
+
+from posts.models import Post
+from posts.thumbnails import KVStore
+
+User = get_user_model()
+
+# Карточки ленты в том виде, как они были до posts.renditions
+CARDS = '''{% load thumbnail %}
+{% for post in posts %}
+  {% thumbnail post.image "960x339" crop="center" upscale=True as im %}
+    <img src="{{ im.url }}" width="{{ im.width }}" height="{{ im.height }}">
+  {% endthumbnail %}
+{% endfor %}'''
+
+RENDITION_CARDS = '''{% load post_tags %}
+{% for post in posts %}
+  {% rendition post 'card' as im %}<img src="{{ im.url }}">
+{% endfor %}'''
+
+
+def png_bytes(index):
+    content = BytesIO()
+    Image.new('RGB', (1200, 800), (index * 20 % 256, 0, 0)).save(
+        content, 'PNG')
+    return content.getvalue()
+
+
+class Command(BaseCommand):
+    help = ('Замер рендера карточек ленты с изображениями: миниатюры sorl '
+            'с хранилищем метаданных cached_db (таблица + кэш) против '
+            'posts.thumbnails.KVStore, и копии posts.renditions. '
+            'Пишет в БД и во временный MEDIA_ROOT, все удаляется в конце')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=30)
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root), \
+                    transaction.atomic():
+                self.run(options)
+                transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def run(self, options):
+        author = User.objects.create(username='bench_thumbnails')
+        posts = []
+        for index in range(options['posts']):
+            post = Post(author=author, text=f'Пост {index}')
+            post.image.save(f'{index}.png', ContentFile(png_bytes(index)),
+                            save=False)
+            post.read_image_meta()
+            post.save()
+            posts.append(post)
+        engine = Engine(libraries=get_installed_libraries())
+        cards = engine.from_string(CARDS)
+        cache = caches['default']
+        self.stdout.write(f'{"store":>10} {"state":>14} '
+                          f'{"ms/render":>10} {"queries":>8}')
+        stores = (('cached_db', cached_db_kvstore.KVStore()),
+                  ('cache+lru', KVStore()))
+        for name, store in stores:
+            default.kvstore._wrapped = store
+            context = {'posts': posts}
+            # Первый рендер создает миниатюры и метаданные
+            cards.render(Context(context))
+            if name == 'cached_db':
+                # Истекший кэш: метаданные из таблицы
+                reset, state = cache.clear, 'cache expired'
+            else:
+                # Новый воркер: LRU процесса пуст, общий кэш заполнен
+                reset, state = store._local.clear, 'new worker'
+            for label, before in (('warm', None), (state, reset)):
+                ms, queries = self.measure(cards, context, before,
+                                           options['repeat'])
+                self.stdout.write(f'{name:>10} {label:>14} '
+                                  f'{ms:>10.2f} {queries:>8}')
+        default.kvstore._wrapped = empty
+        ms, queries = self.measure(engine.from_string(RENDITION_CARDS),
+                                   {'posts': posts}, None, options['repeat'])
+        self.stdout.write(f'{"renditions":>10} {"-":>14} '
+                          f'{ms:>10.2f} {queries:>8}')
+
+    def measure(self, template, context, before, repeat):
+        '''Медиана времени рендера и число запросов в последнем'''
+        timings = []
+        for _ in range(repeat):
+            if before is not None:
+                before()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                template.render(Context(context))
+                timings.append(time.perf_counter() - start)
+        return statistics.median(timings) * 1000, len(queries)
@@ -0,0 +1,63 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts import writebehind
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Пропускная способность записи комментариев при одновременных '
+            'комментаторах: транзакция на комментарий против write-behind. '
+            'Пишет в настоящую БД, тестовые данные удаляются в конце')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--comments', type=int, default=200,
+                            help='Комментариев на поток')
+
+    def handle(self, *args, **options):
+        author = User.objects.create(username='bench_writebehind')
+        try:
+            post = Post.objects.create(author=author, text='Пост')
+            total = options['threads'] * options['comments']
+            for name, write in (('sync', self.write_sync),
+                                ('write-behind', self.write_behind)):
+                elapsed = self.run(write, author, post, options)
+                written = Comment.objects.filter(post=post).count()
+                self.stdout.write(f'{name:>12}: {total / elapsed:10.0f} '
+                                  f'комментариев/с ({written} записано)')
+                Comment.objects.filter(post=post).delete()
+        finally:
+            author.delete()
+
+    def run(self, write, author, post, options):
+        def worker():
+            try:
+                for i in range(options['comments']):
+                    write(Comment(post=post, author=author,
+                                  text=f'Комментарий {i}'))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Время write-behind включает запись остатка очереди
+        writebehind.queue.flush()
+        return time.perf_counter() - start
+
+    def write_sync(self, comment):
+        comment.save()
+
+    def write_behind(self, comment):
+        writebehind.queue.add_comment(comment)
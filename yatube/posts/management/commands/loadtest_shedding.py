@@ -0,0 +1,123 @@
+import itertools
+import logging
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import (ThreadedWSGIServer,
+                                          WSGIRequestHandler,
+                                          get_internal_wsgi_application)
+from django.test import Client, override_settings
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class Server(ThreadedWSGIServer):
+    # Очередь accept() не должна переполняться раньше, чем запрос дойдет
+    # до middleware: иначе хвост задержек - повторы SYN
+    request_queue_size = 256
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест сброса нагрузки: сервер с приложением в этом '
+            'процессе, смесь запросов пользователя с сессией, анонимных '
+            'дальних страниц группы и /about/. Задержки по классам '
+            'запросов с выключенным и включенным LoadSheddingMiddleware. '
+            'Пишет в настоящую БД, тестовые данные удаляются в конце')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=5,
+                            help='Секунд на каждый прогон')
+
+    def handle(self, *args, **options):
+        author = User.objects.create(username='bench_loadshed')
+        group = Group.objects.create(title='bench_loadshed',
+                                     slug='bench-loadshed')
+        try:
+            Post.objects.bulk_create(
+                Post(author=author, group=group, text=f'Пост {i}')
+                for i in range(100))
+            client = Client()
+            client.force_login(author)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            server = Server(('127.0.0.1', 0), QuietHandler)
+            server.set_app(get_internal_wsgi_application())
+            threading.Thread(target=server.serve_forever,
+                             daemon=True).start()
+            base = f'http://127.0.0.1:{server.server_port}'
+            traffic = [
+                ('session', base + '/', {
+                    'Cookie': f'{settings.SESSION_COOKIE_NAME}={session}'}),
+                ('deep page', base + '/group/bench-loadshed/?page=8', {}),
+                ('deep page', base + '/group/bench-loadshed/?page=9', {}),
+                ('about', base + '/about/author/', {}),
+            ]
+            # Каждый сброшенный запрос django.request пишет как warning
+            logging.getLogger('django.request').setLevel(logging.ERROR)
+            try:
+                for enabled in (False, True):
+                    with override_settings(LOAD_SHEDDING_ENABLED=enabled):
+                        results = self.run(traffic, options)
+                    self.report(enabled, results)
+            finally:
+                server.shutdown()
+                server.server_close()
+        finally:
+            author.delete()
+            group.delete()
+
+    def run(self, traffic, options):
+        results = defaultdict(list)
+        deadline = time.monotonic() + options['duration']
+
+        def worker(offset):
+            for name, url, headers in itertools.islice(
+                    itertools.cycle(traffic), offset, None):
+                if time.monotonic() > deadline:
+                    break
+                request = urllib.request.Request(url, headers=headers)
+                start = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(request) as response:
+                        response.read()
+                        status = response.status
+                except urllib.error.HTTPError as error:
+                    status = error.code
+                results[name].append((time.perf_counter() - start, status))
+
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in range(options['clients'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def report(self, enabled, results):
+        self.stdout.write('load shedding ' + ('on' if enabled else 'off'))
+        for name, samples in results.items():
+            served = sorted(elapsed for elapsed, status in samples
+                            if status != 503)
+            shed = len(samples) - len(served)
+            if not served:
+                self.stdout.write(f'{name:>12}: все {shed} сброшены')
+                continue
+            p99 = served[min(len(served) - 1, int(len(served) * 0.99))]
+            self.stdout.write(
+                f'{name:>12}: {len(served):6} обслужено, {shed:6} сброшено, '
+                f'p50 {statistics.median(served) * 1000:7.1f} мс, '
+                f'p99 {p99 * 1000:7.1f} мс')
@@ -0,0 +1,56 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts.storage import is_hashed, post_images
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ('Переносит изображения постов из posts/<имя> в хранилище по '
+            'хэшу содержимого пачками: копирует файл, меняет Post.image, '
+            'после коммита удаляет старый файл без ссылок')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--keep-old', action='store_true',
+                            help='Не удалять старые файлы')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(image=None).order_by(
+            'pk')
+        last_pk = 0
+        moved = failed = 0
+        while True:
+            chunk = list(posts.filter(pk__gt=last_pk).values_list(
+                'pk', 'image')[:options['chunk_size']])
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+            renamed = {}
+            for pk, name in chunk:
+                if is_hashed(name) or name in renamed:
+                    continue
+                try:
+                    # Повторное изображение не копируется: save() вернет
+                    # имя уже существующего файла
+                    with post_images.open(name, 'rb') as file:
+                        renamed[name] = post_images.save(name, file)
+                except Exception:
+                    logger.exception('Cannot move image %s of post %s',
+                                     name, pk)
+                    failed += 1
+                    continue
+                moved += 1
+            with transaction.atomic():
+                Post.objects.bulk_update(
+                    [Post(pk=pk, image=renamed[name])
+                     for pk, name in chunk if name in renamed],
+                    ['image'])
+                if not options['keep_old']:
+                    for name in renamed:
+                        post_images.release(name, legacy=True)
+            self.stdout.write(f'Перенесено файлов: {moved}, ошибок: {failed}')
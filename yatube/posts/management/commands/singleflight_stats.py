@@ -0,0 +1,28 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+from posts import singleflight
+
+
+class Command(BaseCommand):
+    help = ('Счетчики single-flight: сколько промахов кэша пересчитано, '
+            'отдано устаревшими и объединено с чужим пересчетом')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cache', default='default',
+                            help='Псевдоним кэша из settings.CACHES')
+        parser.add_argument('--reset', action='store_true',
+                            help='Обнулить счетчики после вывода')
+
+    def handle(self, *args, **options):
+        cache = caches[options['cache']]
+        counts = singleflight.stats(cache)
+        for event, count in counts.items():
+            self.stdout.write(f'{event:>12}: {count}')
+        misses = counts['recompute'] + counts['wait_timeout']
+        saved = counts['stale'] + counts['coalesced']
+        if misses + saved:
+            self.stdout.write(f'{"coalesced %":>12}: '
+                              f'{100 * saved / (misses + saved):.1f}')
+        if options['reset']:
+            singleflight.reset_stats(cache)
@@ -0,0 +1,80 @@
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Строка вывода python -X importtime: self [us] | cumulative | имя модуля
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+SETUP_SCRIPT = '''
+import time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+setup = time.perf_counter()
+get_resolver().url_patterns
+print(setup - start, time.perf_counter() - setup)
+'''
+
+
+class Command(BaseCommand):
+    help = ('Профиль старта воркера: время django.setup(), загрузки urlconf '
+            'и импорта каждого приложения из INSTALLED_APPS')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10,
+                            help='Сколько самых медленных модулей показать')
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', SETUP_SCRIPT],
+            cwd=settings.BASE_DIR,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, check=True,
+        )
+        setup, urls = (float(x) for x in result.stdout.split())
+        imports = self.parse(result.stderr)
+
+        self.stdout.write(f'django.setup(): {setup * 1000:8.1f} ms')
+        self.stdout.write(f'urlconf:        {urls * 1000:8.1f} ms')
+        self.stdout.write('')
+        self.stdout.write(f'{"app":<44} {"import, ms":>10}')
+        for app in settings.INSTALLED_APPS:
+            ms = self.app_time(imports, app) / 1000
+            self.stdout.write(f'{app:<44} {ms:>10.1f}')
+        self.stdout.write('')
+        self.stdout.write(f'{"module (self time)":<44} {"ms":>10}')
+        slowest = sorted(imports, key=lambda item: item[2], reverse=True)
+        for name, depth, self_us, cumulative in slowest[:options['top']]:
+            self.stdout.write(f'{name:<44} {self_us / 1000:>10.1f}')
+
+    def parse(self, output):
+        '''Список (модуль, глубина, self us, cumulative us) в порядке
+        вывода: вложенные импорты печатаются раньше родителя'''
+        imports = []
+        for line in output.splitlines():
+            match = IMPORT_LINE.match(line)
+            if match:
+                self_us, cumulative, indent, name = match.groups()
+                imports.append((name, len(indent) // 2, int(self_us),
+                                int(cumulative)))
+        return imports
+
+    def app_time(self, imports, app):
+        '''Суммарное cumulative время модулей приложения без двойного
+        учета вложенных друг в друга импортов'''
+        total = 0
+        ancestors = []
+        for name, depth, self_us, cumulative in reversed(imports):
+            while ancestors and ancestors[-1][0] >= depth:
+                ancestors.pop()
+            in_app = name == app or name.startswith(app + '.')
+            nested = any(parent == app or parent.startswith(app + '.')
+                         for _, parent in ancestors)
+            if in_app and not nested:
+                total += cumulative
+            ancestors.append((depth, name))
+        return total
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = ('Удаляет остывшие оценки ленты популярного; порядок ленты от '
+            'запуска не зависит, достаточно cron раз в час')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true',
+                            help='Сначала создать оценки для свежих постов '
+                                 'без них')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            created = trending.backfill()
+            self.stdout.write(f'Создано оценок: {created}')
+        deleted = trending.prune()
+        self.stdout.write(f'Удалено: {deleted}')
@@ -0,0 +1,190 @@
+'''
+Раздача файлов из MEDIA_ROOT.
+
+serve() проверяет путь (только каталоги из MEDIA_SERVE_PREFIXES, без
+выхода за MEDIA_ROOT) и условные заголовки, после чего:
+* с MEDIA_SENDFILE = 'x-accel-redirect' отдает пустой ответ с
+  X-Accel-Redirect: MEDIA_ACCEL_PREFIX + путь, и файл передает nginx
+  (internal location с alias на MEDIA_ROOT);
+* с MEDIA_SENDFILE = 'x-sendfile' - заголовок X-Sendfile для Apache или
+  lighttpd;
+* иначе сам отдает FileResponse. WSGI-сервер с wsgi.file_wrapper
+  (gunicorn) передает такой файл через sendfile без копирования в
+  Python, в том числе запрошенный диапазон (Range).
+
+Имена по хэшу содержимого (posts.storage) и миниатюры sorl (cache/) не
+меняются, поэтому кэшируются на год с immutable.
+'''
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .conf import setting
+from .storage import is_hashed
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def resolve(path):
+    '''Абсолютный путь разрешенного файла или Http404'''
+    path = posixpath.normpath(path).lstrip('/')
+    if path.startswith('..') or not path.startswith(
+            tuple(setting('MEDIA_SERVE_PREFIXES'))):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except Exception:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    return path, full_path
+
+
+def is_immutable(path):
+    return is_hashed(path) or path.startswith(
+        tuple(setting('MEDIA_IMMUTABLE_PREFIXES')))
+
+
+def etag(path, stat):
+    if is_hashed(path):
+        # Имя и есть хэш содержимого
+        return '"{}"'.format(posixpath.splitext(posixpath.basename(path))[0])
+    return f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def parse_range(header, size):
+    '''(start, end) включительно для одного диапазона, None - отдать
+    файл целиком, ValueError - диапазон вне файла (416)'''
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Несколько диапазонов и прочие формы: весь файл, как разрешает
+        # RFC 7233
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(0, size - int(last))
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError
+    return start, end
+
+
+class FileRange:
+    '''Часть открытого файла для FileResponse. fileno() и tell() ведут к
+    самому файлу, поэтому gunicorn отдает диапазон через sendfile'''
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def offload(path, full_path, accel_prefix):
+    mode = setting('MEDIA_SENDFILE')
+    if mode == 'x-accel-redirect':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = accel_prefix + path
+    elif mode == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = full_path
+    else:
+        return None
+    # Длину и диапазоны обработает веб-сервер
+    return response
+
+
+def file_response(request, full_path, size, tag):
+    ranges = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not ranges or (if_range and if_range != tag):
+        response = FileResponse(open(full_path, 'rb'))
+        response['Content-Length'] = str(size)
+        return response
+    try:
+        byte_range = parse_range(ranges, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is None:
+        response = FileResponse(open(full_path, 'rb'))
+        response['Content-Length'] = str(size)
+        return response
+    start, end = byte_range
+    response = FileResponse(FileRange(open(full_path, 'rb'), start,
+                                      end - start + 1), status=206)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(end - start + 1)
+    return response
+
+
+def send(request, path, full_path, immutable, accel_prefix=None,
+         encoding=None):
+    '''Ответ с файлом full_path; path - его путь от каталога, который
+    nginx отдает по accel_prefix (по умолчанию MEDIA_ROOT). encoding -
+    Content-Encoding заранее сжатого варианта (style.css.gz - text/css в
+    gzip), тип содержимого тогда берется по имени без суффикса сжатия'''
+    stat = os.stat(full_path)
+    tag = etag(path, stat)
+    not_modified = get_conditional_response(request, etag=tag,
+                                            last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return not_modified
+
+    if accel_prefix is None:
+        accel_prefix = setting('MEDIA_ACCEL_PREFIX')
+    response = offload(path, full_path, accel_prefix)
+    if response is None:
+        response = file_response(request, full_path, stat.st_size, tag)
+        response['Accept-Ranges'] = 'bytes'
+    name = os.path.splitext(full_path)[0] if encoding else full_path
+    # guess_type знает .br только с Python 3.9, поэтому кодировку не берем
+    # из него
+    content_type, _ = mimetypes.guess_type(name)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['ETag'] = tag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if immutable:
+        response['Cache-Control'] = (
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable')
+    else:
+        response['Cache-Control'] = 'public, max-age={}'.format(
+            setting('MEDIA_MAX_AGE'))
+    return response
+
+
+@require_safe
+def serve(request, path):
+    path, full_path = resolve(path)
+    return send(request, path, full_path, is_immutable(path))
@@ -0,0 +1,41 @@
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.db import migrations
+from django.utils import timezone
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+HALF_LIFE = getattr(settings, 'TRENDING_HALF_LIFE', 6 * 60 * 60)
+
+
+def half_lives(moment):
+    return (moment - EPOCH).total_seconds() / HALF_LIFE
+
+
+def to_epoch(apps, schema_editor):
+    '''Оценка на момент updated -> log2 оценки, приведенной к EPOCH'''
+    TrendingScore = apps.get_model('posts', 'TrendingScore')
+    rows = list(TrendingScore.objects.all())
+    for row in rows:
+        row.score = math.log2(max(row.score, 1e-9)) + half_lives(row.updated)
+    TrendingScore.objects.bulk_update(rows, ['score'], batch_size=1000)
+
+
+def from_epoch(apps, schema_editor):
+    TrendingScore = apps.get_model('posts', 'TrendingScore')
+    rows = list(TrendingScore.objects.all())
+    for row in rows:
+        row.score = 2 ** (row.score - half_lives(row.updated))
+    TrendingScore.objects.bulk_update(rows, ['score'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_epoch, from_epoch),
+    ]
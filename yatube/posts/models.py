@@ -1,8 +1,25 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.template.defaultfilters import linebreaksbr
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from .storage import post_images
 
 User = get_user_model()
 
+# Длина анонса поста в ленте, символов
+EXCERPT_LENGTH = 400
+
+
+def render_text(text):
+    '''HTML текста поста и анонса (пустой, если текст короче анонса)'''
+    excerpt = Truncator(text).chars(EXCERPT_LENGTH)
+    return (
+        linebreaksbr(text, autoescape=True),
+        linebreaksbr(excerpt, autoescape=True) if excerpt != text else '',
+    )
+
 
 class Group(models.Model):
     title = models.CharField(max_length=200)
@@ -26,7 +43,26 @@ class Post(models.Model):
                               help_text='Выберите группу из списка (или '
                               'оставьте поле пустым)',
                               verbose_name='Группа')
-    image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # Файлы по хэшу содержимого, см. posts.storage; индекс - для подсчета
+    # ссылок на файл
+    image = models.ImageField(upload_to='posts/', blank=True, null=True,
+                              storage=post_images, db_index=True)
+    # Сведения об изображении, заполняют PostForm.save() и админка
+    # (posts.images).
+    # Не width_field/height_field: те открывают файл при загрузке поста
+    # из БД, пока поля не заполнены
+    image_width = models.PositiveIntegerField(null=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, editable=False)
+    image_format = models.CharField(max_length=10, blank=True,
+                                    editable=False)
+    image_size = models.PositiveIntegerField(null=True, editable=False)
+    # Средний цвет '#rrggbb' - фон, пока изображение не загрузилось
+    image_color = models.CharField(max_length=7, blank=True, editable=False)
+    # Пишется пачками из posts.viewcounts
+    views = models.PositiveIntegerField(default=0, editable=False)
+    # Готовый HTML текста и анонса, заполняет save() при изменении текста
+    text_html = models.TextField(blank=True, editable=False)
+    excerpt_html = models.TextField(blank=True, editable=False)
 
     class Meta:
         ordering = ['-pub_date', '-id']
@@ -34,6 +70,53 @@ class Post(models.Model):
     def __str__(self) -> str:
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        # Текст, по которому построен сохраненный text_html
+        if post.__dict__.get('text_html'):
+            post._rendered_text = post.__dict__.get('text')
+        return post
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if (update_fields is None or 'text' in update_fields) and (
+                'text' not in self.get_deferred_fields()
+                and self.text != getattr(self, '_rendered_text', None)):
+            self.render_text()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {
+                    'text_html', 'excerpt_html'}
+        super().save(*args, **kwargs)
+
+    def read_image_meta(self):
+        from .images import image_metadata
+        meta = image_metadata(self.image) if self.image else {}
+        self.image_width = meta.get('width')
+        self.image_height = meta.get('height')
+        self.image_format = meta.get('format', '')
+        self.image_size = meta.get('size')
+        self.image_color = meta.get('color', '')
+
+    def render_text(self):
+        self.text_html, self.excerpt_html = render_text(self.text)
+        self._rendered_text = self.text
+
+    @property
+    def body(self):
+        '''Полный текст для страницы поста'''
+        if not self.text_html:
+            # Пост еще не обработан командой backfill_post_html
+            self.render_text()
+        return mark_safe(self.text_html)
+
+    @property
+    def excerpt(self):
+        '''Анонс для ленты'''
+        if not self.text_html:
+            self.render_text()
+        return mark_safe(self.excerpt_html or self.text_html)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post,
@@ -62,3 +145,18 @@ class Follow(models.Model):
 
     def __str__(self) -> str:
         return f'{self.user.username} follows {self.author.username}'
+
+
+class TrendingScore(models.Model):
+    '''Оценка поста для ленты популярного, см. posts.trending'''
+    post = models.OneToOneField(Post,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='trending')
+    # log2 оценки, приведенной к trending.EPOCH
+    score = models.FloatField(db_index=True)
+    # Момент последнего изменения оценки
+    updated = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f'{self.post_id}: {self.score:.2f}'
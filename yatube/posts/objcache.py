@@ -0,0 +1,207 @@
+'''
+Кэш объектов между запросами (cache-aside) для горячих User, Group и Post.
+
+Поиск по pk и по натуральному ключу (username, slug). Двухуровневый:
+* L1 - LRU в памяти процесса на OBJECT_CACHE_L1_TTL секунд; запись
+  хранит версию объекта и отдается, только если версия в L2 та же, так
+  что изменение в другом воркере видно сразу, а L1 экономит чтение и
+  распаковку самого объекта;
+* L2 - общий Django cache (settings.OBJECT_CACHE), ключ данных содержит
+  версию объекта. Сохранение или удаление объекта увеличивает версию,
+  поэтому читатель, загрузивший объект из БД до изменения, не сможет
+  положить устаревшую копию под актуальный ключ. Сигналы поднимают
+  версию еще раз после коммита: читатель, успевший загрузить строку до
+  коммита, положит ее под промежуточную версию.
+
+Натуральный ключ хранится отдельно как ссылка на pk и всегда проверяется
+по загруженному объекту, так что переименование не вернет чужой объект.
+Каждый вызов возвращает отдельную копию объекта.
+'''
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+from . import singleflight
+from .conf import incr, setting
+from .models import Group, Post
+
+# Модели в кэше и их натуральные ключи
+NATURAL_KEYS = {
+    get_user_model(): ('username',),
+    Group: ('slug',),
+    Post: (),
+}
+
+
+class LRUCache:
+    '''Потокобезопасный LRU с временем жизни записей'''
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = setting('OBJECT_CACHE_L1_SIZE')
+        if not size:
+            return
+        expires = time.monotonic() + setting('OBJECT_CACHE_L1_TTL')
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local = LRUCache()
+
+
+def shared():
+    return caches[setting('OBJECT_CACHE')]
+
+
+def is_cached(model):
+    return model in NATURAL_KEYS
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def version_key(model, pk):
+    return f'obj:v:{label(model)}:{pk}'
+
+
+def local_key(model, pk):
+    return label(model), pk
+
+
+def data_key(model, pk, version):
+    return f'obj:{label(model)}:{pk}:{version}'
+
+
+def natural_key(model, field, value):
+    return f'obj:nk:{label(model)}:{field}:{value}'
+
+
+def get_many(model, pks):
+    '''Словарь pk -> объект для найденных pk: версии всех pk одним
+    запросом к L2, совпавшие по версии берутся из L1, остальные из L2
+    вторым запросом к кэшу, не найденные там - одним запросом к БД'''
+    cache = shared()
+    stored = cache.get_many([version_key(model, pk) for pk in pks])
+    versions = {pk: stored.get(version_key(model, pk), 0) for pk in pks}
+    found = {}
+    missing = []
+    for pk in pks:
+        item = local.get(local_key(model, pk))
+        if item is not None and item[0] == versions[pk]:
+            found[pk] = pickle.loads(item[1])
+        else:
+            missing.append(pk)
+    if not missing:
+        return found
+
+    keys = {pk: data_key(model, pk, versions[pk]) for pk in missing}
+    cached = cache.get_many(list(keys.values()))
+    to_load = []
+    for pk in missing:
+        instance = cached.get(keys[pk])
+        if instance is None:
+            to_load.append(pk)
+            continue
+        found[pk] = instance
+        remember(model, pk, versions[pk], instance)
+
+    if to_load:
+        # Горячий объект после сброса загружает из БД один воркер
+        loaded = singleflight.load_many(
+            cache, {pk: keys[pk] for pk in to_load},
+            model._default_manager.in_bulk,
+            setting('OBJECT_CACHE_TIMEOUT'))
+        for pk, instance in loaded.items():
+            remember(model, pk, versions[pk], instance)
+        found.update(loaded)
+    return found
+
+
+def remember(model, pk, version, instance):
+    local.set(local_key(model, pk), (version, pickle.dumps(instance)))
+
+
+def get(model, pk=None, **natural):
+    '''Объект по pk или по одному натуральному ключу (username=...,
+    slug=...). Если объекта нет, бросает model.DoesNotExist.'''
+    if natural:
+        (field, value), = natural.items()
+        if field not in NATURAL_KEYS[model]:
+            raise ValueError(f'{field} is not a natural key of {model}')
+        return get_by_natural_key(model, field, value)
+    instance = get_many(model, [pk]).get(pk)
+    if instance is None:
+        raise model.DoesNotExist
+    return instance
+
+
+def get_by_natural_key(model, field, value):
+    key = natural_key(model, field, value)
+    pk = local.get(key)
+    if pk is None:
+        pk = shared().get(key)
+    if pk is not None:
+        instance = get_many(model, [pk]).get(pk)
+        if instance is not None and getattr(instance, field) == value:
+            local.set(key, pk)
+            return instance
+    # Сначала pk: get_many прочитает версию до загрузки объекта из БД
+    pk = model._default_manager.filter(**{field: value}).values_list(
+        'pk', flat=True).first()
+    instance = get_many(model, [pk]).get(pk) if pk is not None else None
+    if instance is None or getattr(instance, field) != value:
+        raise model.DoesNotExist
+    shared().set(key, pk, setting('OBJECT_CACHE_TIMEOUT'))
+    local.set(key, pk)
+    return instance
+
+
+def invalidate(model, pks, instances=()):
+    '''Сбрасывает объекты после изменения: новая версия в L2, удаление
+    из L1 этого процесса и ссылок по натуральным ключам'''
+    cache = shared()
+    for pk in pks:
+        key = version_key(model, pk)
+        # Старая версия удаляется сразу: если счетчик версий вытеснят из
+        # кэша, под версией 0 не окажется устаревшей копии
+        version = cache.get(key, 0)
+        cache.delete_many([data_key(model, pk, version),
+                           data_key(model, pk, 0)])
+        incr(cache, key, initial=version + 1)
+        local.delete(local_key(model, pk))
+    for instance in instances:
+        for field in NATURAL_KEYS[model]:
+            key = natural_key(model, field, getattr(instance, field))
+            cache.delete(key)
+            local.delete(key)
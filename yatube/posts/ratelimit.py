@@ -0,0 +1,127 @@
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.shortcuts import render
+
+from .conf import setting
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    '''"10/m" -> (10, 60): сколько запросов и за сколько секунд'''
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class TokenBucket:
+    '''Ведро токенов поверх Django cache.
+
+    Ведро емкостью capacity равномерно наполняется за period секунд.
+    Хранить уровень ведра и время последнего пополнения нельзя без
+    read-modify-write, поэтому уровень считается по двум соседним окнам
+    длиной period: текущее окно целиком плюс доля предыдущего, которая
+    еще не "вытекла". Каждый запрос - один атомарный cache.incr, так что
+    одновременные запросы разных воркеров не перетирают друг друга.'''
+
+    def __init__(self, key, rate, cache=None):
+        self.key = key
+        self.capacity, self.period = parse_rate(rate)
+        self.cache = cache or caches[setting('RATELIMIT_CACHE')]
+        # Окно, в котором взят токен последним разрешенным consume()
+        self.taken = None
+
+    def window_key(self, window):
+        return f'rl:{self.key}:{self.period}:{window}'
+
+    def consume(self, now=None):
+        '''Забирает токен. Возвращает 0, если запрос разрешен,
+        иначе через сколько секунд стоит повторить.'''
+        now = time.time() if now is None else now
+        window, offset = divmod(now, self.period)
+        current_key = self.window_key(int(window))
+        # Окно должно пережить следующее, где оно станет предыдущим
+        self.cache.add(current_key, 0, timeout=self.period * 2)
+        try:
+            used = self.cache.incr(current_key)
+        except ValueError:
+            # Ключ вытеснили между add и incr - считаем запрос первым
+            self.cache.set(current_key, 1, timeout=self.period * 2)
+            used = 1
+        previous = self.cache.get(self.window_key(int(window) - 1), 0)
+        leaked = offset / self.period
+        level = used + previous * (1 - leaked)
+        if level <= self.capacity:
+            self.taken = current_key
+            return 0
+        # Отказ не должен тратить токен
+        self.release(current_key)
+        if previous:
+            wait = (level - self.capacity) * self.period / previous
+        else:
+            wait = self.period - offset
+        return max(1, math.ceil(min(wait, self.period - offset)))
+
+    def refund(self):
+        '''Возвращает токен, взятый последним разрешенным consume()'''
+        if self.taken is not None:
+            self.release(self.taken)
+            self.taken = None
+
+    def release(self, key):
+        try:
+            self.cache.decr(key)
+        except ValueError:
+            pass
+
+
+def client_ip(request):
+    header = setting('RATELIMIT_IP_HEADER')
+    if header and request.META.get(header):
+        return request.META[header].split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def buckets(scope, request):
+    '''Ведра, через которые проходит запрос: по пользователю и по IP'''
+    config = settings.RATELIMITS.get(scope, {})
+    if config.get('user') and request.user.is_authenticated:
+        yield TokenBucket(f'{scope}:user:{request.user.pk}', config['user'])
+    if config.get('ip'):
+        yield TokenBucket(f'{scope}:ip:{client_ip(request)}', config['ip'])
+
+
+def too_many_requests(request, retry_after):
+    response = render(request, 'misc/429.html',
+                      {'retry_after': retry_after}, status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(scope):
+    '''Ограничивает частоту запросов к view по настройке
+    settings.RATELIMITS[scope]: {'user': '10/m', 'ip': '30/m',
+    'methods': ['POST']}. Сверх лимита - 429 с заголовком Retry-After.'''
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            config = settings.RATELIMITS.get(scope, {})
+            methods = config.get('methods', ['POST'])
+            if (setting('RATELIMIT_ENABLED')
+                    and request.method in methods):
+                passed = []
+                for bucket in buckets(scope, request):
+                    retry_after = bucket.consume()
+                    if retry_after:
+                        # Отклоненный запрос не тратит токены ведер,
+                        # которые он уже прошел
+                        for taken in passed:
+                            taken.refund()
+                        return too_many_requests(request, retry_after)
+                    passed.append(bucket)
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,186 @@
+'''
+Уменьшенные копии изображений постов по запросу.
+
+/renditions/<имя>/<формат>/<Post.image> отдает копию изображения поста
+для размера из IMAGE_RENDITIONS в формате из IMAGE_RENDITION_FORMATS.
+Копия создается при первом запросе и хранится в MEDIA_ROOT/renditions,
+общий размер каталога ограничен IMAGE_RENDITION_CACHE_SIZE байт: при
+превышении удаляются давно не запрошенные копии (время изменения файла
+обновляется при обращении, не чаще раза в TOUCH_INTERVAL). Новая
+раскладка страницы - новая запись в IMAGE_RENDITIONS, без пересоздания
+всех миниатюр.
+
+Одну копию создает один воркер: право на нее выдает блокировка в кэше
+(posts.singleflight), остальные ждут появления файла до
+IMAGE_RENDITION_WAIT секунд. Адрес копии изображения с именем по хэшу
+не меняется, поэтому она кэшируется как неизменяемая.
+'''
+import hashlib
+import logging
+import os
+import posixpath
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import Http404
+from django.urls import reverse
+from django.views.decorators.http import require_safe
+from PIL import Image, ImageOps
+
+from . import media, singleflight
+from .conf import setting
+from .models import Post
+from .storage import is_hashed, post_images
+
+logger = logging.getLogger(__name__)
+
+# Доля лимита, до которой освобождается каталог
+EVICT_TO = 0.9
+TOUCH_INTERVAL = 60 * 60
+POLL_INTERVAL = 0.05
+RENDITION_DIR = 'renditions'
+EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp', 'png': 'png'}
+
+
+def rendition_path(source, name, fmt):
+    '''Путь копии от MEDIA_ROOT; от параметров размера зависит, чтобы
+    их изменение не отдавало старые копии'''
+    spec = setting('IMAGE_RENDITIONS')[name]
+    digest = hashlib.md5(f'{source}:{name}:{sorted(spec.items())}'.encode()
+                         ).hexdigest()
+    return posixpath.join(RENDITION_DIR, digest[:2],
+                          f'{digest}.{EXTENSIONS[fmt]}')
+
+
+def dimensions(post, name):
+    '''(ширина, высота) копии или None, если размер исходника неизвестен'''
+    spec = setting('IMAGE_RENDITIONS')[name]
+    width, height = spec['size']
+    if spec.get('crop'):
+        return width, height
+    if not post.image_width or not post.image_height:
+        return None
+    scale = min(1, width / post.image_width, height / post.image_height)
+    return (max(1, round(post.image_width * scale)),
+            max(1, round(post.image_height * scale)))
+
+
+def url(source, name, fmt):
+    return reverse('rendition', kwargs={'name': name, 'fmt': fmt,
+                                        'source': source})
+
+
+def render(source, spec, fmt, full_path):
+    '''Создает копию атомарно: читатели не увидят недописанный файл'''
+    with post_images.open(source, 'rb') as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        if spec.get('crop'):
+            image = ImageOps.fit(image, spec['size'], Image.LANCZOS)
+        else:
+            image.thumbnail(spec['size'], Image.LANCZOS)
+        if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(full_path), suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as output:
+                image.save(output, fmt.upper(),
+                           quality=setting('IMAGE_RENDITION_QUALITY'))
+            os.replace(temp_path, full_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def files(root):
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+
+def evict(max_size=None):
+    '''Удаляет давно не запрошенные копии, пока каталог больше лимита.
+    Возвращает число удаленных файлов.'''
+    if max_size is None:
+        max_size = setting('IMAGE_RENDITION_CACHE_SIZE')
+    entries = list(files(os.path.join(settings.MEDIA_ROOT, RENDITION_DIR)))
+    total = sum(size for _, size, _ in entries)
+    if total <= max_size:
+        return 0
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_size * EVICT_TO:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def evict_if_due():
+    interval = setting('IMAGE_RENDITION_EVICT_INTERVAL')
+    if cache.add('renditions:evict', 1, interval):
+        evict()
+
+
+def touch(full_path):
+    '''Отмечает обращение к копии для вытеснения по давности'''
+    now = time.time()
+    try:
+        if now - os.stat(full_path).st_mtime > TOUCH_INTERVAL:
+            os.utime(full_path, (now, now))
+    except FileNotFoundError:
+        pass
+
+
+def ensure(source, name, fmt, full_path):
+    '''Создает копию, если ее нет; одновременные запросы той же копии
+    ждут, пока ее создаст один из них'''
+    key = f'renditions:{full_path}'
+    owner = singleflight.acquire(cache, key)
+    if not owner:
+        deadline = time.monotonic() + setting('IMAGE_RENDITION_WAIT')
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            if os.path.exists(full_path):
+                return
+        logger.warning('Rendering %s without lock', full_path)
+    try:
+        if not os.path.exists(full_path):
+            render(source, setting('IMAGE_RENDITIONS')[name], fmt, full_path)
+    finally:
+        if owner:
+            singleflight.release(cache, key)
+    evict_if_due()
+
+
+@require_safe
+def serve(request, name, fmt, source):
+    if (name not in setting('IMAGE_RENDITIONS')
+            or fmt not in setting('IMAGE_RENDITION_FORMATS')):
+        raise Http404
+    path = rendition_path(source, name, fmt)
+    full_path = os.path.join(settings.MEDIA_ROOT, path)
+    if os.path.exists(full_path):
+        touch(full_path)
+    else:
+        # Копии делаются только для изображений постов
+        if not Post.objects.filter(image=source).exists():
+            raise Http404
+        try:
+            ensure(source, name, fmt, full_path)
+        except (OSError, ValueError):
+            logger.warning('Cannot render %s', source, exc_info=True)
+            raise Http404
+    return media.send(request, path, full_path, is_hashed(source))
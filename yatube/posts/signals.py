@@ -0,0 +1,257 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import feeds, holes, objcache, sitemaps, trending
+from .storage import post_images
+from .models import Comment, Follow, Group, Post
+
+# Поля пользователя, которые видны в картах сайта и лентах
+SHOWN_USER_FIELDS = ('username', 'first_name', 'last_name', 'is_active')
+
+
+def publish_post(post):
+    '''Отправляет пост в открытые потоки процесса; без них карточка не
+    собирается'''
+    # Модуль потоков (и загрузчик шаблонов) не нужен воркеру при старте
+    from . import events
+    if events.broker.connections:
+        events.broker.publish(events.post_event(post))
+
+
+@receiver(post_save, sender=Post)
+def publish_new_post(sender, instance, created, **kwargs):
+    '''Отправляет новый пост в открытые потоки после коммита транзакции'''
+    if created:
+        transaction.on_commit(lambda: publish_post(instance))
+
+
+@receiver(post_save, sender=Post)
+def score_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.post_created(instance)
+
+
+@receiver(post_save, sender=Comment)
+def score_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.comments_added([instance])
+
+
+@receiver(post_save, sender=Follow)
+def score_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        trending.follows_added([instance.author_id])
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_row(sender, instance, raw=False, update_fields=None,
+                     **kwargs):
+    '''Изображение и группа поста до сохранения'''
+    instance._old_image = instance._old_group_id = None
+    if raw or instance.pk is None or (
+            update_fields is not None
+            and not {'image', 'group', 'group_id'} & set(update_fields)):
+        return
+    old = Post.objects.filter(pk=instance.pk).values_list(
+        'image', 'group_id').first()
+    if old is not None:
+        instance._old_image, instance._old_group_id = old
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, **kwargs):
+    old_image = getattr(instance, '_old_image', None)
+    if old_image and old_image != instance.image.name:
+        post_images.release(old_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        post_images.release(instance.image.name)
+
+
+def now_and_on_commit(func, *args):
+    '''Вызывает func сразу (для чтения внутри той же транзакции) и еще раз
+    после коммита: другой воркер до коммита читает из БД старую строку и
+    может положить ее в кэш под уже поднятой версией'''
+    if transaction.get_connection().in_atomic_block:
+        func(*args)
+    transaction.on_commit(lambda: func(*args))
+
+
+def invalidate_cached_object(sender, instance, **kwargs):
+    '''Сбрасывает кэш объекта при сохранении и удалении'''
+    now_and_on_commit(objcache.invalidate, sender, [instance.pk], [instance])
+
+
+for cached_model in objcache.NATURAL_KEYS:
+    post_save.connect(invalidate_cached_object, sender=cached_model)
+    post_delete.connect(invalidate_cached_object, sender=cached_model)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def reset_post_pages(sender, instance, created=True, raw=False, **kwargs):
+    '''Страница поста и профиль автора; число постов в карточке автора
+    меняют только создание и удаление'''
+    if raw:
+        return
+    username = instance.author.username
+    scopes = {f'post:{instance.pk}', f'posts:{username}'}
+    if created:
+        scopes.add(f'user:{username}')
+    now_and_on_commit(holes.bump, *scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def reset_comment_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        now_and_on_commit(holes.bump, *holes.post_scopes([instance.post_id]))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def reset_follow_pages(sender, instance, raw=False, **kwargs):
+    '''Число подписок и подписчиков в карточках обоих пользователей'''
+    if not raw:
+        now_and_on_commit(holes.bump, *holes.user_scopes(
+            [instance.user_id, instance.author_id]))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def reset_group_pages(sender, instance, raw=False, **kwargs):
+    '''Название группы на страницах ее постов; при удалении посты
+    отвязываются от группы до post_delete'''
+    if not raw:
+        post_ids = Post.objects.filter(group=instance).values_list(
+            'pk', flat=True)
+        now_and_on_commit(holes.bump, *holes.post_scopes(post_ids))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def reset_post_sitemap(sender, instance, created=True, raw=False,
+                       **kwargs):
+    # Адрес и дата поста не меняются после создания
+    if created and not raw:
+        now_and_on_commit(sitemaps.bump, 'posts', instance.pk)
+
+
+@receiver(pre_save, sender=get_user_model())
+def remember_old_user(sender, instance, raw=False, update_fields=None,
+                      **kwargs):
+    '''Поля пользователя, видные в картах сайта и лентах, до сохранения'''
+    instance._old_user = None
+    if raw or instance.pk is None or (
+            update_fields is not None
+            and not set(SHOWN_USER_FIELDS) & set(update_fields)):
+        return
+    instance._old_user = sender.objects.filter(pk=instance.pk).values(
+        *SHOWN_USER_FIELDS).first()
+
+
+@receiver(post_save, sender=get_user_model())
+def reset_profile_sitemap(sender, instance, created=False, raw=False,
+                          **kwargs):
+    if raw:
+        return
+    if created:
+        now_and_on_commit(sitemaps.bump, 'profiles', instance.pk)
+        return
+    old = getattr(instance, '_old_user', None)
+    if old is None:
+        return
+    renamed = old['username'] != instance.username
+    if renamed or old['is_active'] != instance.is_active:
+        now_and_on_commit(sitemaps.bump, 'profiles', instance.pk)
+    if renamed:
+        # Имя пользователя есть в адресах его постов
+        shards = Post.objects.filter(author=instance).order_by().annotate(
+            shard=(F('pk') - 1) / sitemaps.shard_size()
+        ).values_list('shard', flat=True).distinct()
+        for shard in shards:
+            now_and_on_commit(sitemaps.bump_shard, 'posts', shard)
+
+
+@receiver(post_save, sender=get_user_model())
+def reset_user_pages(sender, instance, raw=False, update_fields=None,
+                     **kwargs):
+    # Вход пользователя меняет только last_login, которого нет на страницах
+    if raw or (update_fields is not None
+               and set(update_fields) == {'last_login'}):
+        return
+    scopes = {f'user:{instance.username}'}
+    old = getattr(instance, '_old_user', None)
+    if old is not None and old['username'] != instance.username:
+        scopes.update((f'user:{old["username"]}',
+                       f'posts:{old["username"]}'))
+        # Имя автора комментария есть на страницах чужих постов
+        commented = Comment.objects.filter(author=instance).order_by(
+        ).values_list('post_id', flat=True).distinct()
+        scopes.update(f'post:{pk}' for pk in commented)
+    now_and_on_commit(holes.bump, *scopes)
+
+
+@receiver(post_delete, sender=get_user_model())
+def reset_deleted_user_pages(sender, instance, **kwargs):
+    now_and_on_commit(holes.bump, f'user:{instance.username}',
+                      f'posts:{instance.username}')
+
+
+@receiver(post_delete, sender=get_user_model())
+def reset_deleted_profile_sitemap(sender, instance, **kwargs):
+    # Посты удаленного пользователя сбрасывают свои части сами
+    now_and_on_commit(sitemaps.bump, 'profiles', instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def reset_group_sitemap(sender, instance, raw=False, **kwargs):
+    if not raw:
+        now_and_on_commit(sitemaps.bump, 'groups', instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def reset_post_feeds(sender, instance, raw=False, update_fields=None,
+                     **kwargs):
+    if raw or update_fields is not None and not {
+            'text', 'group', 'group_id', 'author', 'author_id'
+    } & set(update_fields):
+        return
+    scopes = {'index', f'author:{instance.author_id}'}
+    for group_id in (instance.group_id,
+                     getattr(instance, '_old_group_id', None)):
+        if group_id is not None:
+            scopes.add(f'group:{group_id}')
+    now_and_on_commit(feeds.bump, *scopes)
+
+
+@receiver(post_save, sender=Group)
+def reset_group_feed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        now_and_on_commit(feeds.bump, f'group:{instance.pk}')
+
+
+@receiver(post_save, sender=get_user_model())
+def reset_author_feeds(sender, instance, **kwargs):
+    old = getattr(instance, '_old_user', None)
+    if old is None or all(old[field] == getattr(instance, field)
+                          for field in ('username', 'first_name',
+                                        'last_name')):
+        return
+    scopes = [f'author:{instance.pk}']
+    if old['username'] != instance.username:
+        # Имя автора есть в записях главной ленты и лент групп
+        group_ids = Post.objects.filter(
+            author=instance, group__isnull=False
+        ).order_by().values_list('group_id', flat=True).distinct()
+        scopes += ['index'] + [f'group:{pk}' for pk in group_ids]
+    now_and_on_commit(feeds.bump, *scopes)
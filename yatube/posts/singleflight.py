@@ -0,0 +1,137 @@
+'''
+Single-flight для промахов кэша: значение ключа пересчитывает только
+один воркер, остальные ненадолго ждут его результата или получают
+устаревшее значение (stale-while-revalidate).
+
+Значение хранится вместе со сроком свежести и живет в кэше еще
+SINGLE_FLIGHT_STALE секунд после него. Право на пересчет выдает
+cache.add() ключа-блокировки, поэтому оно общее для всех воркеров,
+которые используют один кэш (для locmem - только внутри процесса).
+
+Счетчики событий лежат в том же кэше и выводятся командой
+singleflight_stats:
+* recompute - значение пересчитано владельцем блокировки;
+* stale - отдано устаревшее значение, пока его пересчитывает другой;
+* coalesced - дождались значения, пересчитанного другим;
+* wait_timeout - не дождались и посчитали сами.
+'''
+import time
+
+from .conf import incr, setting
+
+
+POLL_INTERVAL = 0.02
+
+EVENTS = ('recompute', 'stale', 'coalesced', 'wait_timeout')
+
+
+def stat_key(event):
+    return f'sf:stats:{event}'
+
+
+def record(cache, event, count=1):
+    incr(cache, stat_key(event), count)
+
+
+def stats(cache):
+    values = cache.get_many([stat_key(event) for event in EVENTS])
+    return {event: values.get(stat_key(event), 0) for event in EVENTS}
+
+
+def reset_stats(cache):
+    cache.delete_many([stat_key(event) for event in EVENTS])
+
+
+def lock_key(key):
+    return f'{key}:lock'
+
+
+def acquire(cache, key):
+    return cache.add(lock_key(key), 1,
+                     setting('SINGLE_FLIGHT_LOCK_TIMEOUT'))
+
+
+def release(cache, key):
+    cache.delete(lock_key(key))
+
+
+def store(cache, key, value, timeout):
+    '''Кладет значение со сроком свежести timeout (None - бессрочно)'''
+    if timeout is None:
+        cache.set(key, (None, value), None)
+    else:
+        cache.set(key, (time.time() + timeout, value),
+                  timeout + setting('SINGLE_FLIGHT_STALE'))
+    return value
+
+
+def get_or_compute(cache, key, compute, timeout):
+    '''Значение key из кэша или compute(), вычисленное одним воркером.
+
+    Если compute() вернул None, значение не сохраняется.'''
+    entry = cache.get(key)
+    if entry is not None:
+        fresh_until, value = entry
+        if fresh_until is None or fresh_until > time.time():
+            return value
+        if not acquire(cache, key):
+            record(cache, 'stale')
+            return value
+    elif not acquire(cache, key):
+        return wait_or_compute(cache, key, compute, timeout)
+
+    try:
+        record(cache, 'recompute')
+        value = compute()
+        if value is not None:
+            store(cache, key, value, timeout)
+        return value
+    finally:
+        release(cache, key)
+
+
+def wait_or_compute(cache, key, compute, timeout):
+    '''Ждет значение, которое считает другой воркер'''
+    deadline = time.monotonic() + setting('SINGLE_FLIGHT_WAIT')
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            record(cache, 'coalesced')
+            return entry[1]
+    record(cache, 'wait_timeout')
+    value = compute()
+    if value is not None:
+        store(cache, key, value, timeout)
+    return value
+
+
+def load_many(cache, keys, load, timeout):
+    '''Объекты для промахов {id: ключ кэша}, загружаемые load(ids) ->
+    {id: объект}. Каждый id грузит только тот, кто взял его блокировку,
+    остальные ждут результат в кэше. Значения кладутся без срока
+    свежести: это для кэшей, которые сбрасываются версиями ключей.'''
+    own = [pk for pk, key in keys.items() if acquire(cache, key)]
+    try:
+        found = load(own) if own else {}
+        cache.set_many({keys[pk]: value for pk, value in found.items()},
+                       timeout)
+    finally:
+        for pk in own:
+            release(cache, keys[pk])
+    if own:
+        record(cache, 'recompute', len(own))
+
+    waiting = {keys[pk]: pk for pk in keys if pk not in own}
+    deadline = time.monotonic() + setting('SINGLE_FLIGHT_WAIT')
+    while waiting and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        ready = cache.get_many(list(waiting))
+        for key, value in ready.items():
+            found[waiting.pop(key)] = value
+        if ready:
+            record(cache, 'coalesced', len(ready))
+    if waiting:
+        record(cache, 'wait_timeout', len(waiting))
+        found.update(load(list(waiting.values())))
+    return found
@@ -0,0 +1,184 @@
+'''
+Карты сайта для постов, профилей и групп.
+
+/sitemap.xml - индекс, /sitemap-<раздел>-<N>.xml - части по
+SITEMAP_SHARD_SIZE id: часть N раздела содержит строки с
+N * SITEMAP_SHARD_SIZE < pk <= (N + 1) * SITEMAP_SHARD_SIZE. Строки
+читаются пачками по pk (WHERE pk > последний ORDER BY pk LIMIT ...), а
+XML отдается потоком по мере чтения, поэтому часть не держится в памяти
+целиком ни в БД, ни в воркере.
+
+Дочитанная до конца часть кладется в кэш сжатой gzip (и так же отдается
+клиенту, который принимает gzip). Ключ части содержит ее версию: версию
+поднимают сигналы при создании и удалении поста, смене имени или
+активности пользователя, изменении группы из этой части (сразу и еще
+раз после коммита), так что остальные части остаются в кэше.
+Адрес и pub_date поста после создания не меняются, поэтому правка поста
+карту не сбрасывает.
+'''
+import gzip
+import zlib
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.html import escape
+from django.views.decorators.http import require_safe
+
+from . import staticfiles
+from .conf import incr, setting
+from .models import Group, Post
+
+
+CONTENT_TYPE = 'application/xml; charset=utf-8'
+URLSET_START = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                '\n')
+URLSET_END = '</urlset>\n'
+
+
+def post_url(pk, username, pub_date):
+    return (reverse('post', args=[username, pk]),
+            pub_date.replace(microsecond=0).isoformat())
+
+
+def profile_url(pk, username):
+    return reverse('profile', args=[username]), None
+
+
+def group_url(pk, slug):
+    return reverse('group_posts', args=[slug]), None
+
+
+# раздел: (queryset, поля с pk первым, строка -> (адрес, lastmod))
+SECTIONS = {
+    'posts': (lambda: Post.objects.all(),
+              ('pk', 'author__username', 'pub_date'), post_url),
+    'profiles': (lambda: get_user_model().objects.filter(is_active=True),
+                 ('pk', 'username'), profile_url),
+    'groups': (lambda: Group.objects.all(), ('pk', 'slug'), group_url),
+}
+
+
+def shard_size():
+    return setting('SITEMAP_SHARD_SIZE')
+
+
+def shard_of(pk):
+    return (pk - 1) // shard_size()
+
+
+def shard_count(section):
+    queryset, _, _ = SECTIONS[section]
+    max_pk = queryset().aggregate(max_pk=Max('pk'))['max_pk'] or 0
+    return shard_of(max_pk) + 1 if max_pk else 1
+
+
+def version_key(section, shard):
+    return f'sitemap:version:{section}:{shard}'
+
+
+def bump(section, pk):
+    '''Сбрасывает кэш части раздела, в которую попадает pk'''
+    bump_shard(section, shard_of(pk))
+
+
+def bump_shard(section, shard):
+    incr(cache, version_key(section, shard))
+
+
+def shard_key(section, shard, base):
+    version = cache.get(version_key(section, shard), 0)
+    return f'sitemap:{section}:{shard}:{version}:{base}'
+
+
+def rows(section, shard):
+    '''Строки части, пачками по pk'''
+    queryset, fields, _ = SECTIONS[section]
+    last = shard * shard_size()
+    high = last + shard_size()
+    chunk_size = setting('SITEMAP_CHUNK_SIZE')
+    while True:
+        chunk = list(queryset().filter(pk__gt=last, pk__lte=high)
+                     .order_by('pk').values_list(*fields)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last = chunk[-1][0]
+
+
+def urlset(section, shard, base):
+    '''XML части кусками по пачке строк'''
+    _, _, url = SECTIONS[section]
+    yield URLSET_START
+    for chunk in rows(section, shard):
+        entries = []
+        for row in chunk:
+            location, lastmod = url(*row)
+            entry = f'<url><loc>{escape(base + location)}</loc>'
+            if lastmod:
+                entry += f'<lastmod>{lastmod}</lastmod>'
+            entries.append(entry + '</url>\n')
+        yield ''.join(entries)
+    yield URLSET_END
+
+
+def cached_stream(parts, key):
+    '''Отдает части и попутно сжимает их; дочитанный до конца ответ
+    кладет в кэш'''
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    compressed = []
+    for part in parts:
+        data = part.encode()
+        compressed.append(compressor.compress(data))
+        yield data
+    compressed.append(compressor.flush())
+    cache.set(key, b''.join(compressed),
+              setting('SITEMAP_CACHE_TIMEOUT'))
+
+
+def compressed_response(request, data):
+    if '.gz' in staticfiles.accepted(request):
+        response = HttpResponse(data, content_type=CONTENT_TYPE)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(data),
+                                content_type=CONTENT_TYPE)
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def base_url(request):
+    return f'{request.scheme}://{request.get_host()}'
+
+
+@require_safe
+def index(request):
+    base = base_url(request)
+    entries = [
+        '<sitemap><loc>{}</loc></sitemap>\n'.format(escape(
+            base + reverse('sitemap_section', args=[section, shard])))
+        for section in SECTIONS
+        for shard in range(shard_count(section))
+    ]
+    return HttpResponse(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        + ''.join(entries) + '</sitemapindex>\n',
+        content_type=CONTENT_TYPE)
+
+
+@require_safe
+def section(request, section, shard):
+    if section not in SECTIONS or shard >= shard_count(section):
+        raise Http404
+    base = base_url(request)
+    key = shard_key(section, shard, base)
+    data = cache.get(key)
+    if data is not None:
+        return compressed_response(request, data)
+    return StreamingHttpResponse(
+        cached_stream(urlset(section, shard, base), key),
+        content_type=CONTENT_TYPE)
@@ -0,0 +1,127 @@
+'''
+Статика с хэшем содержимого в имени и заранее сжатыми вариантами.
+
+CompressedManifestStaticFilesStorage при collectstatic дает файлам имена
+с хэшем (bootstrap.min.3f2a....css, ссылки внутри CSS переписываются) и
+кладет рядом сжатые копии: .gz всегда, .br - если установлен пакет
+brotli. Копия остается, только если она заметно меньше файла.
+
+serve() отдает файлы STATIC_ROOT и выбирает вариант по Accept-Encoding:
+br, затем gzip, иначе исходный файл. Передача файла - как у медиа
+(posts.media.send), с X-Accel-Redirect через STATIC_ACCEL_PREFIX; nginx,
+который сам отдает STATIC_ROOT, делает то же через gzip_static.
+Файлы с хэшем в имени кэшируются на год с immutable.
+'''
+import gzip
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import Http404
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+
+from . import media
+from .conf import setting
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Сжатая копия хранится, если она меньше этой доли исходного файла
+MAX_RATIO = 0.95
+# Суффикс сжатой копии: Content-Encoding
+ENCODINGS = {'.br': 'br', '.gz': 'gzip'}
+# Имя, которое дает ManifestStaticFilesStorage: name.<12 hex>.ext
+HASHED = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+
+def compressors():
+    yield '.gz', lambda data: gzip.compress(data, 9, mtime=0)
+    if brotli is not None:
+        yield '.br', brotli.compress
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    manifest_strict = False
+
+    def stored_name(self, name):
+        '''Файл, не прошедший через collectstatic (или отсутствующий),
+        отдается по исходному имени вместо ошибки рендера страницы'''
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        extensions = tuple(setting('STATIC_COMPRESS_EXTENSIONS'))
+        for name in sorted(set(self.hashed_files.values())):
+            if name.lower().endswith(extensions):
+                for compressed in self.compress(name):
+                    yield name, compressed, True
+
+    def compress(self, name):
+        '''Пишет сжатые копии файла, возвращает их имена'''
+        with self.open(name) as file:
+            data = file.read()
+        if len(data) < setting('STATIC_COMPRESS_MIN_SIZE'):
+            return []
+        written = []
+        for suffix, compress in compressors():
+            compressed = compress(data)
+            if len(compressed) < len(data) * MAX_RATIO:
+                with open(self.path(name + suffix), 'wb') as output:
+                    output.write(compressed)
+                written.append(name + suffix)
+        return written
+
+
+def accepted(request):
+    '''Суффиксы сжатых вариантов, которые примет клиент, по предпочтению'''
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    codings = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        codings[coding.strip().lower()] = quality
+    wildcard = codings.get('*', 0)
+    return [suffix for suffix, coding in ENCODINGS.items()
+            if codings.get(coding, wildcard) > 0]
+
+
+@require_safe
+def serve(request, path):
+    if path.endswith(tuple(ENCODINGS)):
+        # Сжатые копии выбираются по Accept-Encoding, не по адресу
+        raise Http404
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except Exception:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    variant, encoding = path, None
+    for suffix in accepted(request):
+        if os.path.isfile(full_path + suffix):
+            variant, full_path = path + suffix, full_path + suffix
+            encoding = ENCODINGS[suffix]
+            break
+    immutable = HASHED.search(path) is not None
+    response = media.send(request, variant, full_path, immutable,
+                          setting('STATIC_ACCEL_PREFIX'),
+                          encoding)
+    if not immutable:
+        response['Cache-Control'] = 'public, max-age={}'.format(
+            setting('STATIC_MAX_AGE'))
+    response['Vary'] = 'Accept-Encoding'
+    return response
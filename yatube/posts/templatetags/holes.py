@@ -0,0 +1,12 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.holes import marker
+
+register = template.Library()
+
+
+@register.simple_tag
+def hole(name, *args):
+    '''Место для персонального фрагмента, см. posts.holes'''
+    return mark_safe(marker(name, *args))
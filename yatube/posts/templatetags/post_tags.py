@@ -0,0 +1,80 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.utils.safestring import mark_safe
+
+from .. import renditions, singleflight
+from ..conf import setting
+
+register = template.Library()
+
+CARD_TEMPLATE = 'includes/post_item.html'
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    '''Карточки всех постов страницы одним проходом: шаблон карточки
+    берется один раз, без {% include %} на каждый пост'''
+    card = context.template.engine.get_template(CARD_TEMPLATE)
+    rendered = []
+    with context.push():
+        for post in posts:
+            context['post'] = post
+            rendered.append(card.render(context))
+    return mark_safe(''.join(rendered))
+
+
+@register.simple_tag
+def rendition(post, name):
+    '''Копия изображения поста размера name: url и размеры для <img>,
+    sources - (MIME-тип, url) предпочтительных форматов для <picture>'''
+    source = post.image.name
+    if not source or source.startswith('/'):
+        return None
+    formats = setting('IMAGE_RENDITION_FORMATS')
+    size = renditions.dimensions(post, name)
+    return {
+        'url': renditions.url(source, name, formats[-1]),
+        'sources': [(f'image/{fmt}', renditions.url(source, name, fmt))
+                    for fmt in formats[:-1]],
+        'width': size[0] if size else None,
+        'height': size[1] if size else None,
+    }
+
+
+def fragment_cache():
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+class CoalescedCacheNode(template.Node):
+    def __init__(self, nodelist, expire_time, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        expire_time = self.expire_time.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        return singleflight.get_or_compute(
+            fragment_cache(), key, lambda: self.nodelist.render(context),
+            None if expire_time is None else int(expire_time))
+
+
+@register.tag
+def coalesced_cache(parser, token):
+    '''Как {% cache время имя [vary_on...] %}, но истекший фрагмент
+    пересчитывает один запрос, а остальные пока получают прежний'''
+    nodelist = parser.parse(('endcoalesced_cache',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            f'{tokens[0]!r} tag requires at least 2 arguments.')
+    return CoalescedCacheNode(
+        nodelist, parser.compile_filter(tokens[1]), tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]])
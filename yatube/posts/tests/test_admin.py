@@ -0,0 +1,132 @@
+import json
+from http import HTTPStatus
+
+from django.contrib.admin import ACTION_CHECKBOX_NAME
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.spammer = User.objects.create_user(username='Spammer')
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовое имя группы',
+            slug='test_group',
+            description='Тестовое описание группы',
+        )
+        for i in range(5):
+            Post.objects.create(text=f'Спам {i}', author=cls.spammer)
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+        Comment.objects.create(post=cls.post, author=cls.spammer,
+                               text='Спам')
+        Follow.objects.create(user=cls.user, author=cls.spammer)
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def changelist_queries(self, model):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.admin_client.get(
+                reverse(f'admin:posts_{model}_changelist'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_changelists(self):
+        '''Списки всех моделей открываются, число запросов не зависит
+        от числа строк'''
+        for model in ('post', 'group', 'comment', 'follow'):
+            with self.subTest(model=model):
+                before = self.changelist_queries(model)
+                author = User.objects.create_user(username=f'New{model}')
+                post = Post.objects.create(text='Текст', author=author,
+                                           group=self.group)
+                Comment.objects.create(post=post, author=author,
+                                       text='Текст')
+                Follow.objects.create(user=author, author=self.user)
+                self.assertEqual(self.changelist_queries(model), before)
+
+    def test_add_and_edit_post(self):
+        '''Пост создается и правится из админки с автором и готовым HTML'''
+        response = self.admin_client.post(
+            reverse('admin:posts_post_add'),
+            {'text': 'Из\nадминки', 'author': self.user.pk, 'group': ''})
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        post = Post.objects.get(text='Из\nадминки')
+        self.assertEqual(post.author, self.user)
+        self.assertEqual(post.text_html, 'Из<br>админки')
+        self.admin_client.post(
+            reverse('admin:posts_post_change', args=[post.pk]),
+            {'text': 'Правка', 'author': self.user.pk, 'group': ''})
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, 'Правка')
+
+    def test_reassign_group(self):
+        '''Действие переносит выбранные записи в группу'''
+        posts = Post.objects.filter(author=self.spammer)
+        self.admin_client.post(reverse('admin:posts_post_changelist'), {
+            'action': 'reassign_group',
+            'group': self.group.pk,
+            ACTION_CHECKBOX_NAME: [post.pk for post in posts],
+        })
+        self.assertEqual(self.group.posts.count(), 5)
+
+    def test_delete_author_spam(self):
+        '''Удаление спама удаляет все записи и комментарии автора'''
+        comment = Comment.objects.get(author=self.spammer)
+        self.admin_client.post(reverse('admin:posts_comment_changelist'), {
+            'action': 'delete_author_spam',
+            ACTION_CHECKBOX_NAME: [comment.pk],
+        })
+        self.assertFalse(Post.objects.filter(author=self.spammer).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertTrue(Post.objects.filter(pk=self.post.pk).exists())
+
+    def test_export_action(self):
+        '''Выбранные комментарии выгружаются в NDJSON потоком'''
+        comment = Comment.objects.get()
+        response = self.admin_client.post(
+            reverse('admin:posts_comment_changelist'), {
+                'action': 'export_ndjson',
+                ACTION_CHECKBOX_NAME: [comment.pk],
+            })
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows, [{
+            'id': comment.pk,
+            'post': self.post.pk,
+            'author': self.spammer.username,
+            'created': DjangoJSONEncoder().default(comment.created),
+            'text': comment.text,
+        }])
+
+    def test_export_filtered_changelist(self):
+        '''Выгрузка по URL учитывает фильтры списка'''
+        response = self.admin_client.get(
+            reverse('admin:posts_post_export'),
+            {'format': 'csv', 'author__id__exact': self.user.pk})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,author,group,pub_date,text,image,views')
+        self.assertEqual(len(lines), 2)
+        self.assertIn(self.user.username, lines[1])
+
+    def test_export_requires_staff(self):
+        '''Выгрузка недоступна обычным пользователям'''
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('admin:posts_post_export'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
@@ -0,0 +1,57 @@
+import gzip
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from ..compression import CompressionMiddleware
+from ..models import Post
+
+User = get_user_model()
+
+BIG = '<p>Текст поста</p>\n' * 200
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    def process(self, response):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_html_compressed(self):
+        response = self.process(HttpResponse(BIG))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content).decode(), BIG)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_below_threshold(self):
+        response = self.process(HttpResponse('<p>Коротко</p>' * 10))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_content_types(self):
+        json = self.process(HttpResponse(BIG, content_type='application/json'))
+        self.assertEqual(json['Content-Encoding'], 'gzip')
+        image = self.process(HttpResponse(BIG, content_type='image/svg'))
+        self.assertFalse(image.has_header('Content-Encoding'))
+
+    def test_streaming(self):
+        '''Поток сжимается по частям, поток событий - нет'''
+        response = self.process(StreamingHttpResponse(
+            iter([BIG, BIG]), content_type='application/xml'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)).decode(),
+            BIG * 2)
+        events = self.process(StreamingHttpResponse(
+            iter([BIG]), content_type='text/event-stream'))
+        self.assertFalse(events.has_header('Content-Encoding'))
+
+
+class SpacelessTemplatesTests(TestCase):
+    def test_card_without_whitespace_between_tags(self):
+        user = User.objects.create_user(username='TestUser')
+        Post.objects.create(text='Пост', author=user)
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        html = gzip.decompress(response.content).decode()
+        self.assertIn('<div class="card mb-3 mt-1 shadow-sm"><div class='
+                      '"card-body">', html)
@@ -0,0 +1,136 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.signals import got_request_exception
+from django.db import IntegrityError, OperationalError
+from django.http import HttpResponse, HttpResponseServerError
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from .. import degraded
+from ..models import Post
+
+User = get_user_model()
+
+BANNER = 'Сайт временно работает только на чтение'
+
+
+class DegradedModeTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(text='Сохраненный пост',
+                                       author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        degraded.breaker.reset()
+        self.client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+        degraded.breaker.reset()
+
+    def open_breaker(self):
+        degraded.breaker.opened_at = time.monotonic()
+
+    def test_read_view_served_from_last_good_render(self):
+        '''При разомкнутом автомате лента отдается из сохраненной копии
+        с баннером и без обращений к БД'''
+        response = self.authorized_client.get(reverse('index'))
+        self.assertNotContains(response, BANNER)
+        self.open_breaker()
+        with self.assertNumQueries(0):
+            response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, 'Сохраненный пост')
+        self.assertContains(response, BANNER)
+        self.assertNotContains(response, '<!--hole:')
+
+    def test_writes_rejected(self):
+        '''Запись при разомкнутом автомате отклоняется с 503'''
+        self.open_breaker()
+        response = self.authorized_client.post(reverse('new_post'),
+                                               {'text': 'Новый пост'})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertContains(response, 'изменения не сохранены',
+                            status_code=503)
+        self.assertFalse(Post.objects.filter(text='Новый пост').exists())
+
+    def test_page_without_copy_unavailable(self):
+        self.open_breaker()
+        response = self.client.get(reverse('group_posts', args=['no-copy']))
+        self.assertEqual(response.status_code, 503)
+
+    @override_settings(DEGRADED_DB_BUDGET=-1, DEGRADED_FAILURE_THRESHOLD=2)
+    def test_slow_database_trips_breaker(self):
+        '''Запросы сверх бюджета времени БД размыкают автомат'''
+        with self.assertLogs('posts.degraded', 'WARNING'):
+            self.client.get(reverse('index'))
+            self.assertTrue(degraded.breaker.allow())
+            self.client.get(reverse('index'))
+            self.assertFalse(degraded.breaker.allow())
+            response = self.client.get(reverse('index'))
+        self.assertContains(response, BANNER)
+
+    def test_trial_request_closes_breaker(self):
+        '''После паузы удачный пробный запрос возвращает обычный режим'''
+        degraded.breaker.opened_at = time.monotonic() - 60
+        with self.assertLogs('posts.degraded', 'WARNING'):
+            response = self.client.get(reverse('index'))
+        self.assertNotContains(response, BANNER)
+        self.assertIsNone(degraded.breaker.opened_at)
+
+    @override_settings(DEGRADED_DB_BUDGET=-1, DEGRADED_FAILURE_THRESHOLD=2)
+    def test_request_without_queries_keeps_failures(self):
+        '''Запрос без обращений к БД не сбрасывает счетчик сбоев'''
+        with self.assertLogs('posts.degraded', 'WARNING'):
+            self.client.get(reverse('index'))
+        middleware = degraded.DegradedModeMiddleware(
+            lambda request: HttpResponse())
+        middleware(RequestFactory().get('/static/app.css'))
+        self.assertEqual(degraded.breaker.failures, 1)
+
+    def test_copy_ignores_other_query_params(self):
+        '''Копия страницы одна на путь и номер страницы'''
+        self.client.get(reverse('index') + '?utm_source=mail')
+        self.open_breaker()
+        response = self.client.get(reverse('index') + '?page=1&ref=feed')
+        self.assertContains(response, 'Сохраненный пост')
+        response = self.client.get(reverse('index') + '?page=2')
+        self.assertEqual(response.status_code, 503)
+
+    def test_database_error_served_from_last_good_render(self):
+        '''Ошибка БД в view заменяется сохраненной копией страницы'''
+        self.client.get(reverse('index'))
+
+        def failing_view(request):
+            try:
+                raise OperationalError('database is locked')
+            except OperationalError:
+                got_request_exception.send(sender=None, request=request)
+            return HttpResponseServerError()
+
+        middleware = degraded.DegradedModeMiddleware(failing_view)
+        response = middleware(RequestFactory().get(reverse('index')))
+        self.assertContains(response, 'Сохраненный пост')
+        self.assertContains(response, BANNER)
+        self.assertEqual(degraded.breaker.failures, 1)
+
+    def test_integrity_error_is_not_outage(self):
+        '''Ошибка приложения остается 500 и не размыкает автомат'''
+        def failing_view(request):
+            try:
+                raise IntegrityError('NOT NULL constraint failed')
+            except IntegrityError:
+                got_request_exception.send(sender=None, request=request)
+            return HttpResponseServerError()
+
+        middleware = degraded.DegradedModeMiddleware(failing_view)
+        response = middleware(RequestFactory().post(reverse('new_post')))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(degraded.breaker.failures, 0)
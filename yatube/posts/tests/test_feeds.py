@@ -0,0 +1,130 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='TestUser')
+        self.group = Group.objects.create(title='Группа', slug='group',
+                                          description='Описание')
+        self.post = Post.objects.create(text='Пост в группе',
+                                        author=self.user, group=self.group)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_feeds(self):
+        urls = {
+            reverse('feed'): 'application/rss+xml',
+            reverse('feed_atom'): 'application/atom+xml',
+            reverse('group_feed', args=['group']): 'application/rss+xml',
+            reverse('group_feed_atom', args=['group']):
+                'application/atom+xml',
+            reverse('author_feed', args=['TestUser']): 'application/rss+xml',
+            reverse('author_feed_atom', args=['TestUser']):
+                'application/atom+xml',
+        }
+        link = reverse('post', args=['TestUser', self.post.pk])
+        for url, content_type in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type))
+                self.assertContains(response, link)
+                self.assertContains(response, 'Пост в группе')
+
+    def test_unknown_group_or_author(self):
+        self.assertEqual(self.client.get(reverse(
+            'group_feed', args=['missing'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse(
+            'author_feed', args=['missing'])).status_code, 404)
+
+    def test_not_modified_without_building(self):
+        '''Повторный запрос с ETag - 304 без сборки ленты, без ETag - XML
+        из кэша; группа берется из кэша объектов, запрос один - последний
+        пост'''
+        url = reverse('group_feed', args=['group'])
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        with self.assertNumQueries(1):
+            cached = self.client.get(url)
+        self.assertEqual(cached.content, response.content)
+
+    def test_changes_reset_etag(self):
+        url = reverse('feed')
+        etag = self.client.get(url)['ETag']
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Исправленный пост')
+        Post.objects.create(text='Новый пост', author=self.user)
+        self.assertNotEqual(self.client.get(url)['ETag'], response['ETag'])
+
+    def test_unrelated_changes_keep_etag(self):
+        '''Лента группы и автора не меняется от чужих постов и новых
+        пользователей'''
+        urls = [reverse('group_feed', args=['group']),
+                reverse('author_feed', args=['TestUser'])]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        other = User.objects.create_user(username='Other')
+        Post.objects.create(text='Чужой пост', author=other)
+        other.set_password('password')
+        other.save()
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_moved_post_resets_both_groups(self):
+        other = Group.objects.create(title='Другая', slug='other')
+        url = reverse('group_feed', args=['group'])
+        etag = self.client.get(url)['ETag']
+        self.post.group = other
+        self.post.save()
+        self.assertEqual(self.client.get(
+            url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertContains(self.client.get(
+            reverse('group_feed', args=['other'])), 'Пост в группе')
+
+    def test_rename_resets_author_and_index(self):
+        url = reverse('feed')
+        etag = self.client.get(url)['ETag']
+        self.user.username = 'Renamed'
+        self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, '/Renamed/')
+
+    def test_edit_moves_last_modified(self):
+        '''Правка без нового поста видна клиенту с If-Modified-Since'''
+        url = reverse('author_feed', args=['TestUser'])
+        last_modified = self.client.get(url)['Last-Modified']
+        with mock.patch('posts.feeds.time.time',
+                        return_value=time.time() + 5):
+            self.post.text = 'Исправленный пост'
+            self.post.save()
+        response = self.client.get(url,
+                                   HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertContains(response, 'Исправленный пост')
+        self.assertNotEqual(response['Last-Modified'], last_modified)
+
+    def test_feed_items_limit(self):
+        Post.objects.bulk_create(Post(text=str(i), author=self.user)
+                                 for i in range(settings.FEED_ITEMS + 5))
+        response = self.client.get(reverse('feed'))
+        self.assertEqual(response.content.count(b'<item>'),
+                         settings.FEED_ITEMS)
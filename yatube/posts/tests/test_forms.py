@@ -9,6 +9,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 
 from ..models import Post, Group, Comment
+from ..storage import is_hashed
 
 User = get_user_model()
 
@@ -63,11 +64,11 @@ class PostFormTests(TestCase):
         self.assertRedirects(response, reverse('index'))
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertEqual(Post.objects.count(), 1)
-        self.assertTrue(Post.objects.filter(
-            text=form_data['text'],
-            group=form_data['group'],
-            image=f'posts/{uploaded.name}'
-        ).exists())
+        post = Post.objects.get(text=form_data['text'],
+                                group=form_data['group'])
+        # Изображение хранится под хэшем содержимого
+        self.assertTrue(is_hashed(post.image.name))
+        self.assertTrue(post.image.name.endswith('.gif'))
 
     def test_edit_post(self):
         '''При правильном заполнении формы запись обновляется; новая запись
@@ -0,0 +1,90 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import holes
+from ..models import Post
+
+User = get_user_model()
+
+
+class HolePunchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.post = Post.objects.create(text='Общий текст', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.url = reverse('post', args=[self.author.username, self.post.id])
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_shared_page_filled_per_user(self):
+        '''Второй пользователь получает страницу из кэша, но со своими
+        навигацией и кнопками'''
+        edit_url = reverse('post_edit',
+                           args=[self.author.username, self.post.id])
+        response = self.author_client.get(self.url)
+        self.assertContains(response, edit_url)
+        self.assertNotContains(response, '<!--hole:')
+        key = holes.page_key(response.wsgi_request,
+                             ['user:Author', f'post:{self.post.id}'])
+        self.assertIsNotNone(cache.get(key))
+
+        with self.assertNumQueries(3):
+            # Сессия, пользователь и подписка для кнопки; страница из кэша
+            response = self.reader_client.get(self.url)
+        self.assertContains(response, 'Общий текст')
+        self.assertContains(response, 'Reader')
+        self.assertNotContains(response, edit_url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+        response = Client().get(self.url)
+        self.assertNotContains(response, edit_url)
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+
+    def test_changes_reset_shared_pages(self):
+        '''Новый комментарий сразу виден на закэшированной странице'''
+        self.reader_client.get(self.url)
+        self.reader_client.post(
+            reverse('add_comment', args=[self.author.username, self.post.id]),
+            {'text': 'Свежий комментарий'})
+        response = self.author_client.get(self.url)
+        self.assertContains(response, 'Свежий комментарий')
+
+    def test_comment_resets_only_its_pages(self):
+        '''Комментарий сбрасывает страницу своего поста, страница другого
+        поста остается в кэше'''
+        other = Post.objects.create(text='Другой пост', author=self.reader)
+        other_url = reverse('post', args=[self.reader.username, other.id])
+        self.reader_client.get(other_url)
+        self.reader_client.post(
+            reverse('add_comment', args=[self.author.username, self.post.id]),
+            {'text': 'Свежий комментарий'})
+        with self.assertNumQueries(3):
+            # Сессия, пользователь и подписка для кнопки; страница из кэша
+            self.reader_client.get(other_url)
+
+    def test_follow_button_is_personal(self):
+        '''Кнопка подписки в профиле зависит от пользователя'''
+        profile = reverse('profile', args=[self.author.username])
+        self.reader_client.get(reverse('profile_follow',
+                                       args=[self.author.username]))
+        response = self.reader_client.get(profile)
+        self.assertContains(response, reverse('profile_unfollow',
+                                              args=[self.author.username]))
+        other = User.objects.create_user(username='Other')
+        other_client = Client()
+        other_client.force_login(other)
+        response = other_client.get(profile)
+        self.assertContains(response, reverse('profile_follow',
+                                              args=[self.author.username]))
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import identity
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class IdentityMapTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+        for i in range(3):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Комментарий {i}')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_same_user_object_on_post_page(self):
+        '''Автор поста, авторы комментариев и request.user на странице
+        поста - один и тот же объект'''
+        response = self.authorized_client.get(
+            reverse('post', args=[self.user.username, self.post.id]))
+        author = response.context['author']
+        self.assertIs(author, response.context['requested_post'].author)
+        for comment in response.context['comments']:
+            self.assertIs(comment.author, author)
+        self.assertEqual(author.pk, response.wsgi_request.user.pk)
+
+    def test_map_cleared_after_request(self):
+        '''После запроса карта не остается в потоке'''
+        self.authorized_client.get(reverse('index'))
+        self.assertIsNone(identity.current())
+
+    @override_settings(DEBUG=True)
+    def test_stats_header(self):
+        '''С DEBUG ответ сообщает, сколько загрузок сэкономила карта'''
+        response = self.authorized_client.get(
+            reverse('profile', args=[self.user.username]))
+        self.assertIn('hits=', response['X-Identity-Map'])
+        self.assertNotIn('hits=0;', response['X-Identity-Map'])
@@ -0,0 +1,79 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post
+
+User = get_user_model()
+
+
+def png(width, height, color):
+    content = BytesIO()
+    Image.new('RGB', (width, height), color).save(content, 'PNG')
+    return SimpleUploadedFile('image.png', content.getvalue(),
+                              content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+class ImageMetadataTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_metadata_stored_on_upload(self):
+        '''Сведения об изображении сохраняются вместе с постом'''
+        image = png(40, 20, (255, 0, 0))
+        self.client.post(reverse('new_post'),
+                         {'text': 'С картинкой', 'image': image})
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (40, 20))
+        self.assertEqual(post.image_format, 'png')
+        self.assertEqual(post.image_size, image.size)
+        self.assertEqual(post.image_color, '#ff0000')
+        # Файл сохранен целиком, несмотря на чтение при разборе
+        self.assertEqual(post.image.size, image.size)
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, 'background-color: #ff0000')
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_backfill(self):
+        '''Команда заполняет сведения у ранее загруженных изображений'''
+        self.client.post(reverse('new_post'),
+                         {'text': 'С картинкой',
+                          'image': png(10, 30, (0, 0, 255))})
+        Post.objects.update(image_width=None, image_height=None,
+                            image_format='', image_size=None,
+                            image_color='')
+        Post.objects.create(text='Без файла', author=self.user,
+                            image='posts/missing.png')
+        with self.assertLogs('posts.management.commands.backfill_image_meta',
+                             'ERROR'):
+            call_command('backfill_image_meta', workers=2, stdout=StringIO())
+        post = Post.objects.get(text='С картинкой')
+        self.assertEqual((post.image_width, post.image_height), (10, 30))
+        self.assertEqual(post.image_color, '#0000ff')
+        self.assertIsNone(Post.objects.get(text='Без файла').image_width)
@@ -0,0 +1,76 @@
+import time
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.contrib.auth import get_user_model
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .. import loadshed
+
+
+class LoadSheddingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = loadshed.LoadSheddingMiddleware(
+            lambda request: HttpResponse('ok'))
+
+    def test_priorities(self):
+        low_paths = loadshed.low_priority_paths()
+        cases = [
+            (self.factory.get('/about/author/'), 'low'),
+            (self.factory.get('/admin/posts/post/export/'), 'low'),
+            (self.factory.get('/', {'page': 50}), 'low'),
+            (self.factory.get('/', {'page': 2}), 'normal'),
+            (self.factory.post('/new/'), 'high'),
+        ]
+        # Cookie сессии не проверить без БД, приоритета она не дает
+        session_only = self.factory.get('/', {'page': 2})
+        session_only.COOKIES[settings.SESSION_COOKIE_NAME] = 'key'
+        cases.append((session_only, 'normal'))
+        forged = self.factory.get('/', {'page': 50})
+        forged.COOKIES[settings.LOAD_SHEDDING_COOKIE] = '1'
+        cases.append((forged, 'low'))
+        for request, priority in cases:
+            with self.subTest(path=request.get_full_path()):
+                self.assertEqual(
+                    loadshed.request_priority(request, low_paths), priority)
+
+    def test_low_priority_shed_first(self):
+        '''При заполненном воркере сбрасываются только запросы
+        низкого приоритета'''
+        self.middleware.in_flight = 4
+        response = self.middleware(self.factory.get('/about/author/'))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        response = self.middleware(self.factory.get('/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.middleware.in_flight, 4)
+        self.assertEqual(self.middleware.shed['low'], 1)
+
+    def test_queue_wait(self):
+        '''Долгое ожидание в очереди сбрасывает анонимов, но не запись'''
+        started = f't={time.time() - 3:.3f}'
+        response = self.middleware(
+            self.factory.get('/', HTTP_X_REQUEST_START=started))
+        self.assertEqual(response.status_code, 503)
+        response = self.middleware(
+            self.factory.post('/new/', HTTP_X_REQUEST_START=started))
+        self.assertEqual(response.status_code, 200)
+
+
+class PriorityCookieTests(TestCase):
+    def test_login_grants_high_priority(self):
+        '''Вход ставит подписанную cookie приоритета, выход ее удаляет'''
+        get_user_model().objects.create_user(username='TestUser',
+                                             password='secret-password')
+        client = Client()
+        client.post(reverse('login'), {'username': 'TestUser',
+                                       'password': 'secret-password'})
+        request = RequestFactory().get('/', {'page': 50})
+        request.COOKIES = {key: morsel.value
+                           for key, morsel in client.cookies.items()}
+        self.assertEqual(loadshed.request_priority(request, []), 'high')
+        client.get(reverse('logout'))
+        self.assertEqual(
+            client.cookies[settings.LOAD_SHEDDING_COOKIE].value, '')
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import Client, SimpleTestCase, override_settings
+
+from ..storage import hashed_name
+
+CONTENT = b'0123456789' * 10
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+HASHED = hashed_name('posts/photo.jpg', DIGEST)
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_SENDFILE=None)
+class MediaServeTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for name in (HASHED, 'posts/old.jpg', 'private/secret.txt'):
+            path = os.path.join(MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file:
+                file.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get(self, name, **headers):
+        return Client().get(settings.MEDIA_URL + name, **headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_hashed_file_is_immutable(self):
+        response = self.get(HASHED)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['ETag'], f'"{DIGEST}"')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_legacy_file_short_cache(self):
+        response = self.get('posts/old.jpg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertNotEqual(response['ETag'], f'"{DIGEST}"')
+
+    def test_not_modified(self):
+        response = self.get(HASHED, HTTP_IF_NONE_MATCH=f'"{DIGEST}"')
+        self.assertEqual(response.status_code, 304)
+
+    def test_range(self):
+        response = self.get(HASHED, HTTP_RANGE='bytes=10-24')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), CONTENT[10:25])
+        self.assertEqual(response['Content-Range'], 'bytes 10-24/100')
+        self.assertEqual(response['Content-Length'], '15')
+
+        response = self.get(HASHED, HTTP_RANGE='bytes=-5')
+        self.assertEqual(self.body(response), CONTENT[-5:])
+
+    def test_range_not_satisfiable(self):
+        response = self.get(HASHED, HTTP_RANGE='bytes=500-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_stale_if_range_sends_whole_file(self):
+        response = self.get(HASHED, HTTP_RANGE='bytes=0-9',
+                            HTTP_IF_RANGE='"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), CONTENT)
+
+    def test_only_public_directories(self):
+        '''Файлы вне MEDIA_SERVE_PREFIXES и выход за MEDIA_ROOT - 404'''
+        for name in ('private/secret.txt', 'posts/../private/secret.txt',
+                     'posts/missing.jpg', '../manage.py'):
+            with self.subTest(name=name):
+                self.assertEqual(self.get(name).status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_accel_redirect(self):
+        response = self.get(HASHED)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/' + HASHED)
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_sendfile(self):
+        response = self.get('posts/old.jpg')
+        self.assertEqual(response['X-Sendfile'],
+                         os.path.join(MEDIA_ROOT, 'posts', 'old.jpg'))
@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from .. import objcache
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class ObjectCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(
+            title='Тестовое имя группы',
+            slug='test_group',
+            description='Тестовое описание группы',
+        )
+        cls.post = Post.objects.create(text='Текст', author=cls.user)
+
+    def tearDown(self):
+        cache.clear()
+        objcache.local.clear()
+
+    def test_lookup_by_natural_key_cached(self):
+        '''Повторный поиск по username и slug обходится без запросов'''
+        objcache.get(User, username='TestUser')
+        objcache.get(Group, slug='test_group')
+        with self.assertNumQueries(0):
+            user = objcache.get(User, username='TestUser')
+            group = objcache.get(Group, slug='test_group')
+        self.assertEqual(user, self.user)
+        self.assertEqual(group, self.group)
+
+    @override_settings(OBJECT_CACHE_L1_SIZE=0)
+    def test_shared_cache_without_l1(self):
+        '''Без L1 объекты берутся из общего кэша'''
+        objcache.get(Post, self.post.pk)
+        with self.assertNumQueries(0):
+            post = objcache.get(Post, self.post.pk)
+        self.assertEqual(post.text, self.post.text)
+
+    def test_l1_checked_against_shared_version(self):
+        '''Сброс в другом воркере (только версия в L2) виден сразу,
+        без ожидания OBJECT_CACHE_L1_TTL'''
+        objcache.get(Post, self.post.pk)
+        Post.objects.filter(pk=self.post.pk).update(text='Новый текст')
+        key = objcache.version_key(Post, self.post.pk)
+        cache.set(key, cache.get(key, 0) + 1, None)
+        self.assertEqual(objcache.get(Post, self.post.pk).text,
+                         'Новый текст')
+
+    def test_copies_returned(self):
+        '''Каждый вызов возвращает свою копию объекта'''
+        first = objcache.get(Post, self.post.pk)
+        second = objcache.get(Post, self.post.pk)
+        self.assertIsNot(first, second)
+
+    def test_invalidated_on_save(self):
+        '''Сохранение объекта сбрасывает кэш, включая старый username'''
+        user = objcache.get(User, username='TestUser')
+        user.username = 'Renamed'
+        user.save()
+        self.assertEqual(objcache.get(User, user.pk).username, 'Renamed')
+        self.assertEqual(objcache.get(User, username='Renamed'), user)
+        with self.assertRaises(User.DoesNotExist):
+            objcache.get(User, username='TestUser')
+
+    def test_invalidated_on_delete(self):
+        '''Удаленный объект не отдается из кэша'''
+        post = Post.objects.create(text='Удалить', author=self.user)
+        objcache.get(Post, post.pk)
+        pk = post.pk
+        post.delete()
+        with self.assertRaises(Post.DoesNotExist):
+            objcache.get(Post, pk)
+
+
+# Вторая смена версии выполняется в on_commit
+class ObjectCacheCommitTests(TransactionTestCase):
+    def tearDown(self):
+        cache.clear()
+        objcache.local.clear()
+
+    def test_copy_loaded_before_commit_is_dropped(self):
+        '''Строка, прочитанная другим воркером до коммита, не отдается
+        после него'''
+        group = Group.objects.create(title='Старое', slug='group')
+        with transaction.atomic():
+            group.title = 'Новое'
+            group.save()
+            # Другой воркер видит старую строку и кэширует ее под новой
+            # версией
+            stale = Group(pk=group.pk, title='Старое', slug='group')
+            version = cache.get(objcache.version_key(Group, group.pk), 0)
+            cache.set(objcache.data_key(Group, group.pk, version), stale)
+        objcache.local.clear()
+        self.assertEqual(objcache.get(Group, group.pk).title, 'Новое')
+        self.assertEqual(objcache.get(Group, slug='group').title, 'Новое')
@@ -0,0 +1,75 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import EXCERPT_LENGTH, Post
+
+User = get_user_model()
+
+LONG_TEXT = 'Начало поста\n' + 'слово ' * EXCERPT_LENGTH + 'ХВОСТ'
+
+
+class PostTextTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='TestUser')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_form_saves_rendered_html(self):
+        '''Новый пост сохраняется с экранированным HTML и анонсом'''
+        self.client.post(reverse('new_post'),
+                         {'text': '<b>жирный</b>\nвторая строка'})
+        post = Post.objects.get()
+        self.assertEqual(post.text_html,
+                         '&lt;b&gt;жирный&lt;/b&gt;<br>вторая строка')
+        self.assertEqual(post.excerpt_html, '')
+
+        self.client.post(reverse('post_edit', args=[self.user.username,
+                                                    post.id]),
+                         {'text': LONG_TEXT})
+        post.refresh_from_db()
+        self.assertIn('ХВОСТ', post.text_html)
+        self.assertNotIn('ХВОСТ', post.excerpt_html)
+
+    def test_feed_shows_excerpt_and_post_page_full_text(self):
+        self.client.post(reverse('new_post'), {'text': LONG_TEXT})
+        post = Post.objects.get()
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Начало поста')
+        self.assertNotContains(response, 'ХВОСТ')
+        self.assertContains(response, 'Читать дальше')
+        response = self.client.get(reverse('post', args=[self.user.username,
+                                                         post.id]))
+        self.assertContains(response, 'ХВОСТ')
+
+    def test_save_renders_changed_text(self):
+        '''HTML обновляется при любом сохранении с новым текстом'''
+        post = Post.objects.create(text='Первый', author=self.user)
+        self.assertEqual(post.text_html, 'Первый')
+        post = Post.objects.get(pk=post.pk)
+        post.text = 'Второй\nтекст'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text_html, 'Второй<br>текст')
+        post.text = LONG_TEXT
+        post.save(update_fields=['text'])
+        post = Post.objects.get(pk=post.pk)
+        self.assertIn('ХВОСТ', post.text_html)
+        self.assertNotIn('ХВОСТ', post.excerpt_html)
+
+    def test_backfill(self):
+        '''Команда заполняет HTML у старых постов пачками'''
+        for i in range(5):
+            Post.objects.create(text=f'Пост\n{i}', author=self.user)
+        Post.objects.update(text_html='', excerpt_html='')
+        call_command('backfill_post_html', chunk_size=2, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(text_html='').exists())
+        self.assertEqual(Post.objects.order_by('pk').first().text_html,
+                         'Пост<br>0')
@@ -0,0 +1,77 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post
+from ..ratelimit import TokenBucket
+
+User = get_user_model()
+
+
+class TokenBucketTests(TestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_bucket_allows_capacity_per_period(self):
+        '''За окно проходит не больше capacity запросов'''
+        bucket = TokenBucket('test', '3/m')
+        allowed = [bucket.consume(now=60) == 0 for _ in range(5)]
+        self.assertEqual(allowed, [True, True, True, False, False])
+
+    def test_bucket_refills_over_time(self):
+        '''Токены возвращаются по мере того, как предыдущее окно вытекает'''
+        bucket = TokenBucket('test', '2/m')
+        bucket.consume(now=60)
+        bucket.consume(now=60)
+        self.assertGreater(bucket.consume(now=61), 0)
+        self.assertEqual(bucket.consume(now=150), 0)
+
+
+@override_settings(RATELIMITS={'new_post': {'user': '2/m', 'ip': '10/m'}})
+class RateLimitViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_new_post_limited(self):
+        '''Сверх лимита new_post отвечает 429 с Retry-After'''
+        for _ in range(2):
+            response = self.authorized_client.post(
+                reverse('new_post'), {'text': 'Текст'})
+            self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        response = self.authorized_client.post(
+            reverse('new_post'), {'text': 'Текст'})
+        self.assertEqual(response.status_code,
+                         HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(Post.objects.count(), 2)
+
+    @override_settings(RATELIMITS={'new_post': {'user': '2/m',
+                                                'ip': '1/m'}})
+    def test_rejected_by_ip_keeps_user_token(self):
+        '''Отказ по IP не тратит токен пользователя'''
+        self.authorized_client.post(reverse('new_post'), {'text': 'Текст'})
+        for _ in range(3):
+            response = self.authorized_client.post(
+                reverse('new_post'), {'text': 'Текст'})
+            self.assertEqual(response.status_code,
+                             HTTPStatus.TOO_MANY_REQUESTS)
+        bucket = TokenBucket(f'new_post:user:{self.user.pk}', '2/m')
+        self.assertEqual(bucket.consume(), 0)
+
+    def test_get_not_limited(self):
+        '''Открытие формы не расходует лимит на создание постов'''
+        for _ in range(5):
+            response = self.authorized_client.get(reverse('new_post'))
+            self.assertEqual(response.status_code, HTTPStatus.OK)
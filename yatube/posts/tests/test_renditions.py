@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import renditions
+from ..models import Post
+
+User = get_user_model()
+
+
+def png_bytes(size=(100, 50)):
+    content = BytesIO()
+    Image.new('RGB', size, (0, 0, 255)).save(content, 'PNG')
+    return content.getvalue()
+
+
+RENDITIONS = {
+    'card': {'size': (40, 20), 'crop': True},
+    'thumb': {'size': (30, 30)},
+}
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR),
+                   IMAGE_RENDITIONS=RENDITIONS)
+class RenditionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='TestUser')
+        self.post = Post(text='С картинкой', author=self.user)
+        self.post.image.save('photo.png', ContentFile(png_bytes()),
+                             save=False)
+        self.post.read_image_meta()
+        self.post.save()
+
+    def tearDown(self):
+        cache.clear()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def get(self, name, fmt, source=None):
+        return Client().get(renditions.url(source or self.post.image.name,
+                                           name, fmt))
+
+    def open(self, response):
+        return Image.open(BytesIO(b''.join(response.streaming_content)))
+
+    def test_crop_rendition(self):
+        response = self.get('card', 'jpeg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        image = self.open(response)
+        self.assertEqual((image.format, image.size), ('JPEG', (40, 20)))
+
+    def test_fit_rendition_size_in_template(self):
+        '''Размер копии без обрезки считается по сохраненному размеру
+        исходника, а в разметке есть webp-вариант'''
+        self.assertEqual(renditions.dimensions(self.post, 'thumb'), (30, 15))
+        self.assertEqual(self.open(self.get('thumb', 'webp')).size, (30, 15))
+        response = Client().get(reverse('post', args=[self.user.username,
+                                                      self.post.pk]))
+        self.assertContains(response, 'width="40" height="20"')
+        self.assertContains(response, 'type="image/webp"')
+
+    def test_rendered_once(self):
+        with mock.patch.object(renditions, 'render',
+                               wraps=renditions.render) as render:
+            self.get('card', 'webp')
+            self.get('card', 'webp')
+        self.assertEqual(render.call_count, 1)
+
+    def test_concurrent_requests_render_once(self):
+        '''Пока копию создает один запрос, другие ждут ее'''
+        started = threading.Event()
+        original = renditions.render
+
+        def slow_render(*args):
+            started.set()
+            threading.Event().wait(0.2)
+            original(*args)
+
+        path = os.path.join(settings.MEDIA_ROOT, renditions.rendition_path(
+            self.post.image.name, 'card', 'jpeg'))
+        with mock.patch.object(renditions, 'render',
+                               side_effect=slow_render) as render:
+            owner = threading.Thread(target=renditions.ensure, args=(
+                self.post.image.name, 'card', 'jpeg', path))
+            owner.start()
+            started.wait(1)
+            renditions.ensure(self.post.image.name, 'card', 'jpeg', path)
+            owner.join()
+        self.assertEqual(render.call_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+    def test_unknown_rendition_or_source(self):
+        self.assertEqual(self.get('huge', 'jpeg').status_code, 404)
+        self.assertEqual(self.get('card', 'bmp').status_code, 404)
+        self.assertEqual(self.get('card', 'jpeg', 'posts/other.png')
+                         .status_code, 404)
+
+    def test_evict_least_recently_used(self):
+        self.get('card', 'jpeg')
+        self.get('card', 'webp')
+        old, recent = (os.path.join(settings.MEDIA_ROOT,
+                                    renditions.rendition_path(
+                                        self.post.image.name, 'card', fmt))
+                       for fmt in ('jpeg', 'webp'))
+        os.utime(old, (1, 1))
+        limit = int(os.path.getsize(recent) / renditions.EVICT_TO) + 1
+        self.assertEqual(renditions.evict(limit), 1)
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(recent))
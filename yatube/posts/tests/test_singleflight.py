@@ -0,0 +1,75 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from .. import singleflight
+
+
+@override_settings(SINGLE_FLIGHT_WAIT=1)
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_concurrent_misses_computed_once(self):
+        '''Одновременные промахи по ключу пересчитывает один поток'''
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'значение'
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                singleflight.get_or_compute(cache, 'feed', compute, 20)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['значение'] * 5)
+        stats = singleflight.stats(cache)
+        self.assertEqual(stats['recompute'], 1)
+        self.assertEqual(stats['coalesced'], 4)
+
+    def test_stale_value_while_recomputing(self):
+        '''Пока истекшее значение пересчитывается, остальные получают
+        прежнее, а не ждут'''
+        singleflight.store(cache, 'feed', 'старое', 20)
+        with mock.patch('time.time', return_value=time.time() + 30):
+            self.assertTrue(singleflight.acquire(cache, 'feed'))
+            value = singleflight.get_or_compute(
+                cache, 'feed', lambda: self.fail('пересчет'), 20)
+            self.assertEqual(value, 'старое')
+            singleflight.release(cache, 'feed')
+            value = singleflight.get_or_compute(cache, 'feed',
+                                                lambda: 'новое', 20)
+        self.assertEqual(value, 'новое')
+        self.assertEqual(singleflight.stats(cache)['stale'], 1)
+
+    @override_settings(SINGLE_FLIGHT_WAIT=0.05)
+    def test_wait_timeout_computes(self):
+        '''Если владелец блокировки не успел, запрос считает сам'''
+        singleflight.acquire(cache, 'feed')
+        value = singleflight.get_or_compute(cache, 'feed', lambda: 'сам', 20)
+        self.assertEqual(value, 'сам')
+        self.assertEqual(singleflight.stats(cache)['wait_timeout'], 1)
+
+    def test_load_many_waits_for_locked_keys(self):
+        '''Объект, который уже грузит другой воркер, берется из кэша'''
+        singleflight.acquire(cache, 'obj:2')
+        threading.Timer(0.05, lambda: cache.set('obj:2', 'чужой')).start()
+        loaded = singleflight.load_many(
+            cache, {1: 'obj:1', 2: 'obj:2'},
+            lambda pks: {pk: f'из БД {pk}' for pk in pks}, 60)
+        self.assertEqual(loaded, {1: 'из БД 1', 2: 'чужой'})
+        self.assertEqual(cache.get('obj:1'), 'из БД 1')
@@ -0,0 +1,102 @@
+import gzip
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import sitemaps
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+@override_settings(SITEMAP_SHARD_SIZE=2, SITEMAP_CHUNK_SIZE=1)
+class SitemapTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='TestUser')
+        Group.objects.create(title='Группа', slug='group')
+        self.posts = [Post.objects.create(text=f'Пост {i}', author=self.user)
+                      for i in range(3)]
+
+    def tearDown(self):
+        cache.clear()
+
+    def shard(self, post):
+        return sitemaps.shard_of(post.pk)
+
+    def get(self, section, shard, **headers):
+        response = self.client.get(
+            reverse('sitemap_section', args=[section, shard]), **headers)
+        if response.streaming:
+            return b''.join(response.streaming_content).decode()
+        if response.get('Content-Encoding') == 'gzip':
+            return gzip.decompress(response.content).decode()
+        return response.content.decode()
+
+    def test_index_lists_shards(self):
+        response = self.client.get(reverse('sitemap'))
+        locations = re.findall(r'<loc>(.*?)</loc>', response.content.decode())
+        post_shards = {self.shard(post) for post in self.posts}
+        self.assertEqual(
+            len([loc for loc in locations if 'sitemap-posts-' in loc]),
+            max(post_shards) + 1)
+        self.assertIn('http://testserver/sitemap-groups-0.xml', locations)
+
+    def test_shard_contents(self):
+        '''В части только посты ее диапазона pk, с lastmod'''
+        post = self.posts[0]
+        xml = self.get('posts', self.shard(post))
+        url = 'http://testserver' + reverse('post', args=['TestUser',
+                                                          post.pk])
+        self.assertIn(f'<loc>{url}</loc>', xml)
+        self.assertIn(post.pub_date.replace(microsecond=0).isoformat(), xml)
+        others = [p for p in self.posts if self.shard(p) != self.shard(post)]
+        for other in others:
+            self.assertNotIn(f'/{other.pk}/<', xml)
+        self.assertIn('/TestUser/</loc>', self.get('profiles', 0))
+
+    def test_cached_until_shard_changes(self):
+        post = self.posts[0]
+        shard = self.shard(post)
+        self.get('posts', shard)
+        with self.assertNumQueries(1):
+            xml = self.get('posts', shard, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertIn(f'/{post.pk}/', xml)
+        # Новый пост в другой части не сбрасывает эту
+        Post.objects.create(text='Новый', author=self.user)
+        with self.assertNumQueries(1):
+            self.get('posts', shard)
+        post.delete()
+        self.assertNotIn(f'/{post.pk}/', self.get('posts', shard))
+
+    def test_rename_resets_post_shards(self):
+        post = self.posts[0]
+        self.get('posts', self.shard(post))
+        self.user.username = 'Renamed'
+        self.user.save()
+        self.assertIn('/Renamed/', self.get('posts', self.shard(post)))
+
+    def test_password_change_keeps_shards(self):
+        '''Сохранение пользователя без смены имени не сбрасывает части'''
+        shard = self.shard(self.posts[0])
+        self.get('posts', shard)
+        self.get('profiles', 0)
+        self.user.set_password('password')
+        self.user.save()
+        with self.assertNumQueries(2):
+            self.get('posts', shard)
+            self.get('profiles', 0)
+
+    def test_deactivation_resets_profiles(self):
+        self.get('profiles', 0)
+        self.user.is_active = False
+        self.user.save()
+        self.assertNotIn('/TestUser/', self.get('profiles', 0))
+
+    def test_unknown_shard(self):
+        self.assertEqual(self.client.get(reverse(
+            'sitemap_section', args=['posts', 100])).status_code, 404)
+        self.assertEqual(self.client.get(reverse(
+            'sitemap_section', args=['comments', 0])).status_code, 404)
@@ -0,0 +1,103 @@
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import Client, SimpleTestCase, override_settings
+
+SOURCE = tempfile.mkdtemp(dir=settings.BASE_DIR)
+STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CSS = 'body { background: url("bg.png"); }\n' + '.card { margin: 0; }\n' * 50
+
+
+@override_settings(
+    STATICFILES_DIRS=[SOURCE], STATIC_ROOT=STATIC_ROOT,
+    STATICFILES_STORAGE=(
+        'posts.staticfiles.CompressedManifestStaticFilesStorage'))
+class StaticPipelineTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(SOURCE, 'css'))
+        with open(os.path.join(SOURCE, 'css', 'site.css'), 'w') as file:
+            file.write(CSS)
+        with open(os.path.join(SOURCE, 'css', 'bg.png'), 'wb') as file:
+            file.write(b'\x89PNG')
+        call_command('collectstatic', interactive=False, verbosity=0,
+                     stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(SOURCE, ignore_errors=True)
+        shutil.rmtree(STATIC_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def get(self, url, **headers):
+        return Client().get(url, **headers)
+
+    def test_hashed_and_compressed(self):
+        '''В шаблонах имя с хэшем, рядом сжатая копия, ссылки в CSS
+        переписаны на имена с хэшем'''
+        name = staticfiles_storage.stored_name('css/site.css')
+        self.assertRegex(name, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertEqual(static('css/site.css'), settings.STATIC_URL + name)
+        with gzip.open(os.path.join(STATIC_ROOT, name + '.gz')) as file:
+            self.assertIn(
+                staticfiles_storage.stored_name('css/bg.png').split('/')[-1],
+                file.read().decode())
+        # Маленькие и несжимаемые файлы не сжимаются
+        self.assertFalse(os.path.exists(os.path.join(
+            STATIC_ROOT, staticfiles_storage.stored_name('css/bg.png')
+            + '.gz')))
+
+    def test_serve_precompressed(self):
+        url = static('css/site.css')
+        response = self.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn(b'.card', gzip.decompress(
+            b''.join(response.streaming_content)))
+
+    def test_serve_brotli(self):
+        '''Вариант .br отдается с типом исходного файла и кодировкой br
+        (mimetypes до Python 3.9 не знает .br)'''
+        path = os.path.join(STATIC_ROOT, 'css', 'brotli.css')
+        for name, data in ((path, b'a {}'), (path + '.br', b'brotli')):
+            with open(name, 'wb') as file:
+                file.write(data)
+        self.addCleanup(os.remove, path)
+        self.addCleanup(os.remove, path + '.br')
+        response = self.get(settings.STATIC_URL + 'css/brotli.css',
+                            HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(b''.join(response.streaming_content), b'brotli')
+
+    def test_serve_identity(self):
+        for encoding in ('', 'gzip;q=0', 'br'):
+            with self.subTest(encoding=encoding):
+                response = self.get(static('css/site.css'),
+                                    HTTP_ACCEPT_ENCODING=encoding)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(b''.join(response.streaming_content),
+                                 CSS.encode().replace(
+                                     b'bg.png', os.path.basename(
+                                         staticfiles_storage.stored_name(
+                                             'css/bg.png')).encode()))
+
+    def test_unhashed_name_short_cache(self):
+        response = self.get(settings.STATIC_URL + 'css/site.css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+    def test_compressed_copy_not_addressable(self):
+        name = staticfiles_storage.stored_name('css/site.css')
+        self.assertEqual(
+            self.get(settings.STATIC_URL + name + '.gz').status_code, 404)
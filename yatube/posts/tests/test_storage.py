@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post
+from ..storage import is_hashed, post_images
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def png_bytes():
+    content = BytesIO()
+    Image.new('RGB', (3, 3), (0, 255, 0)).save(content, 'PNG')
+    return content.getvalue()
+
+
+# Файлы удаляются в on_commit, поэтому транзакции должны коммититься
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+class ContentAddressedStorageTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='TestUser')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        cache.clear()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, text, name='meme.GIF'):
+        self.client.post(reverse('new_post'), {
+            'text': text,
+            'image': SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        })
+        return Post.objects.get(text=text)
+
+    def test_same_image_stored_once(self):
+        '''Повторная загрузка того же изображения ссылается на один
+        файл во вложенных каталогах'''
+        first = self.upload('Первый')
+        second = self.upload('Второй', name='copy.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_hashed(first.image.name))
+        self.assertRegex(first.image.name,
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.gif$')
+        self.assertTrue(post_images.exists(first.image.name))
+
+    def test_file_deleted_with_last_reference(self):
+        first = self.upload('Первый')
+        second = self.upload('Второй')
+        name = first.image.name
+        first.delete()
+        self.assertTrue(post_images.exists(name))
+        second.delete()
+        self.assertFalse(post_images.exists(name))
+
+    def test_replaced_image_released(self):
+        post = self.upload('Пост')
+        old_name = post.image.name
+        self.client.post(
+            reverse('post_edit', args=[self.user.username, post.id]),
+            {'text': 'Пост', 'image': SimpleUploadedFile(
+                'other.png', png_bytes(), 'image/png')})
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(post_images.exists(old_name))
+
+    def test_migrate_command(self):
+        '''Команда переносит старые файлы и меняет пути в постах'''
+        legacy = FileSystemStorage()
+        names = [legacy.save(f'posts/old{i}.gif', ContentFile(SMALL_GIF))
+                 for i in range(3)]
+        for i, name in enumerate(names):
+            Post.objects.create(text=f'Старый {i}', author=self.user,
+                                image=name)
+        call_command('migrate_media_storage', chunk_size=2,
+                     stdout=StringIO())
+        images = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(images), 1)
+        self.assertTrue(is_hashed(images.pop()))
+        for name in names:
+            self.assertFalse(legacy.exists(name))
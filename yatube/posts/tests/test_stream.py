@@ -0,0 +1,105 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import events, signals
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(POSTS_STREAM_TIMEOUT=0)
+class PostStreamTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.group = Group.objects.create(
+            title='Тестовое имя группы',
+            slug='test_group',
+            description='Тестовое описание группы',
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        events.broker = events.PostBroker()
+
+    def publish(self, **kwargs):
+        post = Post.objects.create(author=self.author, text='Текст',
+                                   **kwargs)
+        events.broker.publish(events.post_event(post))
+        return post
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_stream_content_type(self):
+        '''Поток отдается как text/event-stream'''
+        response = self.guest_client.get(reverse('post_stream'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('retry:', self.read(response))
+
+    def test_replay_after_last_event_id(self):
+        '''При переподключении приходят только пропущенные посты'''
+        old_post = self.publish()
+        new_post = self.publish(group=self.group)
+        response = self.guest_client.get(
+            reverse('post_stream'), HTTP_LAST_EVENT_ID=str(old_post.pk))
+        body = self.read(response)
+        self.assertIn(f'id: {new_post.pk}\n', body)
+        self.assertNotIn(f'id: {old_post.pk}\n', body)
+        self.assertIn('card', body)
+
+    def test_group_stream_filters_posts(self):
+        '''В поток группы попадают только посты этой группы'''
+        other_post = self.publish()
+        group_post = self.publish(group=self.group)
+        response = self.guest_client.get(
+            reverse('post_stream') + f'?group={self.group.slug}',
+            HTTP_LAST_EVENT_ID='0')
+        body = self.read(response)
+        self.assertIn(f'id: {group_post.pk}\n', body)
+        self.assertNotIn(f'id: {other_post.pk}\n', body)
+
+    def test_follow_stream(self):
+        '''Поток подписок требует авторизации и содержит посты авторов'''
+        response = self.guest_client.get(
+            reverse('post_stream') + '?feed=follow')
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        post = self.publish()
+        response = self.authorized_client.get(
+            reverse('post_stream') + '?feed=follow', HTTP_LAST_EVENT_ID='0')
+        self.assertIn(f'id: {post.pk}\n', self.read(response))
+
+    @override_settings(POSTS_STREAM_MAX_CONNECTIONS=0)
+    def test_connection_limit(self):
+        '''Сверх лимита потоков на воркер отвечаем 503 с Retry-After'''
+        response = self.guest_client.get(reverse('post_stream'))
+        self.assertEqual(response.status_code,
+                         HTTPStatus.SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+
+    def test_closed_before_reading_frees_slot(self):
+        '''Поток, закрытый до первого чтения, не занимает лимит'''
+        response = self.guest_client.get(reverse('post_stream'))
+        self.assertEqual(events.broker.connections, 1)
+        response.close()
+        self.assertEqual(events.broker.connections, 0)
+
+    def test_no_card_without_subscribers(self):
+        '''Без открытых потоков карточка нового поста не собирается'''
+        post = Post.objects.create(author=self.author, text='Текст')
+        with mock.patch.object(events, 'post_event') as post_event:
+            signals.publish_post(post)
+            post_event.assert_not_called()
+            events.broker.subscribe([events.index_channel()])
+            signals.publish_post(post)
+            post_event.assert_called_once_with(post)
@@ -0,0 +1,54 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .. import thumbnails
+
+
+def png_file(name):
+    content = BytesIO()
+    Image.new('RGB', (20, 10), (255, 0, 0)).save(content, 'PNG')
+    return default_storage.save(name, ContentFile(content.getvalue()))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+class ThumbnailKVStoreTests(TestCase):
+    def setUp(self):
+        self.store = thumbnails.KVStore()
+        patcher = mock.patch.object(default.kvstore, '_wrapped', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.sources = [ImageFile(png_file(f'posts/{i}.png'))
+                        for i in range(3)]
+
+    def tearDown(self):
+        cache.clear()
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def test_no_database_queries(self):
+        thumbnail = get_thumbnail(self.sources[0], '10x5')
+        with self.assertNumQueries(0):
+            self.assertEqual(get_thumbnail(self.sources[0], '10x5').size,
+                             thumbnail.size)
+
+    @override_settings(THUMBNAIL_LOCAL_SIZE=2)
+    def test_local_lru_bounded(self):
+        for source in self.sources:
+            get_thumbnail(source, '10x5')
+        self.assertEqual(len(self.store._local), 2)
+
+    def test_delete(self):
+        thumbnail = get_thumbnail(self.sources[0], '10x5')
+        self.store.delete(self.sources[0])
+        self.assertIsNone(self.store.get(thumbnail))
+        self.assertFalse(thumbnail.exists())
@@ -0,0 +1,92 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending, writebehind
+from ..models import Comment, Follow, Post, TrendingScore
+
+User = get_user_model()
+
+
+@override_settings(TRENDING_HALF_LIFE=3600)
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='TestUser')
+        self.reader = User.objects.create_user(username='Reader')
+        self.quiet = Post.objects.create(text='Тихий пост', author=self.user)
+        self.hot = Post.objects.create(text='Горячий пост',
+                                       author=self.user)
+
+    def tearDown(self):
+        cache.clear()
+
+    def score(self, post, now=None):
+        return trending.current(TrendingScore.objects.get(post=post).score,
+                                now or timezone.now())
+
+    def test_comments_raise_score(self):
+        '''Комментарий прибавляет вес к оценке, приведенной к текущему
+        моменту'''
+        before = self.score(self.hot)
+        Comment.objects.create(post=self.hot, author=self.reader, text='!')
+        self.assertAlmostEqual(self.score(self.hot), before + 1, places=2)
+
+    def test_follow_raises_recent_posts(self):
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.assertAlmostEqual(self.score(self.quiet), 1.5, places=2)
+        self.assertAlmostEqual(self.score(self.hot), 1.5, places=2)
+
+    def test_decay_and_prune(self):
+        '''Через период полураспада оценка вдвое меньше, остывшие посты
+        удаляются из таблицы'''
+        now = timezone.now() + timedelta(hours=1)
+        self.assertAlmostEqual(self.score(self.hot, now), 0.5, places=2)
+        self.assertEqual(trending.prune(now), 0)
+        self.assertEqual(trending.prune(now + timedelta(hours=4)), 2)
+        self.assertFalse(TrendingScore.objects.filter(
+            post__in=[self.hot, self.quiet]).exists())
+
+    def test_order_without_redecay(self):
+        '''Старая оценка сравнивается со свежей без пересчета: пост с
+        тремя комментариями два часа назад ниже поста с одним сейчас'''
+        TrendingScore.objects.all().delete()
+        trending.add_score(self.hot.pk, 3,
+                           timezone.now() - timedelta(hours=2))
+        trending.add_score(self.quiet.pk, 1, timezone.now())
+        self.assertEqual(
+            list(TrendingScore.objects.order_by('-score').values_list(
+                'post', flat=True)),
+            [self.quiet.pk, self.hot.pk])
+
+    def test_backfill(self):
+        TrendingScore.objects.all().delete()
+        Comment.objects.bulk_create(
+            Comment(post=self.hot, author=self.reader, text=str(i))
+            for i in range(3))
+        self.assertEqual(trending.backfill(), 2)
+        self.assertAlmostEqual(self.score(self.hot), 4, places=2)
+
+    def test_feed_order(self):
+        '''Лента популярного упорядочена по оценке и пагинируется как
+        главная'''
+        for i in range(2):
+            Comment.objects.create(post=self.hot, author=self.reader,
+                                   text=str(i))
+        response = Client().get(reverse('trending'))
+        self.assertEqual(list(response.context['page']),
+                         [self.hot, self.quiet])
+        self.assertEqual(response.context['page'].paginator.per_page, 10)
+
+    @override_settings(POSTS_WRITE_BEHIND=True)
+    def test_write_behind_comments_scored(self):
+        '''Пакетная запись без сигналов тоже обновляет оценки'''
+        before = self.score(self.hot)
+        writebehind.queue.add_comment(
+            Comment(post=self.hot, author=self.reader, text='!'))
+        writebehind.queue.follow(self.reader.pk, self.user.pk)
+        writebehind.queue.flush()
+        self.assertAlmostEqual(self.score(self.hot), before + 1.5, places=2)
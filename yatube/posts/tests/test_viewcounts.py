@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import viewcounts
+from ..models import Post
+
+User = get_user_model()
+
+BROWSER = 'Mozilla/5.0 (X11; Linux x86_64) Firefox/90.0'
+
+
+# Длинное окно: фоновый поток не успеет записать счетчики сам
+@override_settings(VIEW_COUNTS_INTERVAL=60, TRENDING_VIEW_WEIGHT=0)
+class ViewCountTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.posts = [Post.objects.create(text=f'Пост {i}', author=cls.user)
+                     for i in range(3)]
+
+    def setUp(self):
+        viewcounts.counter = viewcounts.ViewCounter()
+
+    def tearDown(self):
+        cache.clear()
+
+    def view(self, post, client=None, agent=BROWSER):
+        client = client or Client(HTTP_USER_AGENT=agent)
+        return client.get(reverse('post', args=[self.user.username, post.id]))
+
+    def test_views_buffered_until_flush(self):
+        '''Просмотр не пишет в БД, повтор тем же посетителем в окне
+        не считается'''
+        client = Client(HTTP_USER_AGENT=BROWSER)
+        for _ in range(3):
+            self.view(self.posts[0], client)
+        self.assertEqual(len(viewcounts.counter), 1)
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].views, 0)
+        viewcounts.counter.flush()
+        self.posts[0].refresh_from_db()
+        self.assertEqual(self.posts[0].views, 1)
+
+    def test_bots_not_counted(self):
+        self.view(self.posts[0], agent='Googlebot/2.1')
+        self.view(self.posts[0], agent='')
+        self.assertEqual(len(viewcounts.counter), 0)
+
+    def test_flush_groups_updates_by_delta(self):
+        '''Одинаковые приращения записываются одним UPDATE'''
+        for visitor in ('a', 'b'):
+            viewcounts.counter.add(self.posts[0].pk, visitor)
+            viewcounts.counter.add(self.posts[1].pk, visitor)
+        viewcounts.counter.add(self.posts[2].pk, 'a')
+        with self.assertNumQueries(2):
+            viewcounts.counter.flush()
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('views', flat=True)),
+            [2, 2, 1])
+
+    def test_count_shown_without_queries(self):
+        '''Число просмотров выводится в карточке из поля поста'''
+        Post.objects.filter(pk=self.posts[0].pk).update(views=42)
+        response = Client().get(reverse('index'))
+        self.assertContains(response, 'Просмотров: 42')
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import writebehind
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+# Длинное окно: фоновый поток не успеет записать пачку сам,
+# сбрасываем очередь в тесте явно
+@override_settings(POSTS_WRITE_BEHIND=True, POSTS_WRITE_BEHIND_WINDOW=60)
+class WriteBehindTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.post = Post.objects.create(text='Текст', author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        writebehind.queue = writebehind.WriteBehindQueue()
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_comments_written_in_batch(self):
+        '''Комментарии попадают в БД при сбросе очереди'''
+        for i in range(3):
+            self.authorized_client.post(
+                reverse('add_comment', args=[self.author.username,
+                                             self.post.id]),
+                {'text': f'Комментарий {i}'})
+        self.assertEqual(Comment.objects.count(), 0)
+        self.assertEqual(len(writebehind.queue), 3)
+        writebehind.queue.flush()
+        self.assertEqual(Comment.objects.filter(post=self.post,
+                                                author=self.user).count(), 3)
+
+    def test_last_follow_operation_wins(self):
+        '''В пределах окна учитывается последняя операция с подпиской'''
+        follow = reverse('profile_follow', args=[self.author.username])
+        unfollow = reverse('profile_unfollow', args=[self.author.username])
+        self.authorized_client.get(follow)
+        self.authorized_client.get(unfollow)
+        writebehind.queue.flush()
+        self.assertFalse(Follow.objects.exists())
+        self.authorized_client.get(follow)
+        self.authorized_client.get(follow)
+        writebehind.queue.flush()
+        self.authorized_client.get(follow)
+        writebehind.queue.flush()
+        self.assertEqual(Follow.objects.filter(user=self.user,
+                                               author=self.author).count(), 1)
+
+    def test_deleted_post_does_not_drop_batch(self):
+        '''Комментарий к посту, удаленному за окно, отбрасывается, а
+        остальная пачка записывается'''
+        post = Post.objects.create(text='Удалить', author=self.author)
+        for target in (post, self.post):
+            self.authorized_client.post(
+                reverse('add_comment', args=[self.author.username,
+                                             target.id]),
+                {'text': 'Комментарий'})
+        self.authorized_client.get(reverse('profile_follow',
+                                           args=[self.author.username]))
+        post.delete()
+        writebehind.queue.flush()
+        self.assertEqual(Comment.objects.filter(post=self.post).count(), 1)
+        self.assertTrue(Follow.objects.filter(user=self.user,
+                                              author=self.author).exists())
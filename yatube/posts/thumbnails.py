@@ -0,0 +1,82 @@
+'''
+Хранилище метаданных миниатюр sorl-thumbnail без таблицы в БД.
+
+Стандартное хранилище sorl (cached_db) при промахе кэша идет в таблицу
+thumbnail_kvstore, по запросу на миниатюру. KVStore держит метаданные
+только в общем кэше (THUMBNAIL_CACHE) и в LRU процесса на
+THUMBNAIL_LOCAL_SIZE записей, поэтому повторная отрисовка той же
+миниатюры воркером не выходит даже в кэш. Потеря записи в кэше не
+страшна: sorl найдет готовый файл миниатюры и запишет ее заново.
+
+Записи процесса живут THUMBNAIL_LOCAL_TIMEOUT секунд: удаление миниатюры
+в другом воркере видно не сразу. Перебрать ключи общего кэша нельзя,
+поэтому команды thumbnail cleanup и clear видят только ключи своего
+процесса.
+'''
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import InvalidCacheBackendError, caches
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.kvstores.base import KVStoreBase
+
+from .conf import setting
+
+
+class KVStore(KVStoreBase):
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        # ключ -> (срок, значение)
+        self._local = OrderedDict()
+
+    @property
+    def cache(self):
+        try:
+            return caches[sorl_settings.THUMBNAIL_CACHE]
+        except InvalidCacheBackendError:
+            return caches['default']
+
+    def _remember(self, items):
+        expires = time.monotonic() + setting('THUMBNAIL_LOCAL_TIMEOUT')
+        size = setting('THUMBNAIL_LOCAL_SIZE')
+        with self._lock:
+            for key, value in items.items():
+                self._local[key] = (expires, value)
+                self._local.move_to_end(key)
+            while len(self._local) > size:
+                self._local.popitem(last=False)
+
+    def _recall(self, key):
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._local[key]
+                return None
+            self._local.move_to_end(key)
+            return entry[1]
+
+    def _get_raw(self, key):
+        value = self._recall(key)
+        if value is None:
+            value = self.cache.get(key)
+            if value is not None:
+                self._remember({key: value})
+        return value
+
+    def _set_raw(self, key, value):
+        self.cache.set(key, value, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        self._remember({key: value})
+
+    def _delete_raw(self, *keys):
+        self.cache.delete_many(keys)
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+    def _find_keys_raw(self, prefix):
+        with self._lock:
+            return [key for key in self._local if key.startswith(prefix)]
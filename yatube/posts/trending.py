@@ -0,0 +1,133 @@
+'''
+Лента популярного: оценка поста растет от комментариев и новых
+подписчиков автора и убывает вдвое каждые TRENDING_HALF_LIFE секунд.
+
+В TrendingScore.score хранится не сама оценка, а ее значение,
+приведенное к общему моменту: log2(оценка) + (t - EPOCH) / полураспад,
+где t - момент, когда оценка была такой. Затухание одинаково для всех
+строк, поэтому порядок по score - порядок по текущей оценке без
+пересчета таблицы, а логарифм не дает числу переполниться со временем.
+Комментарий или подписка прибавляет вес одним UPDATE по формуле над
+score, без блокировки строки. Команда trending_decay только удаляет
+остывшие посты. TRENDING_HALF_LIFE нельзя менять без пересчета score.
+'''
+import math
+from collections import Counter
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Log, Power
+from django.utils import timezone
+
+from .conf import setting
+from .models import Follow, Post, TrendingScore
+
+BACKFILL_CHUNK_SIZE = 1000
+# Момент, к которому приводятся все оценки
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def half_lives(moment):
+    '''Число периодов полураспада от EPOCH до moment'''
+    return (moment - EPOCH).total_seconds() / setting('TRENDING_HALF_LIFE')
+
+
+def stored(score, moment):
+    '''Значение для TrendingScore.score: оценка score в момент moment'''
+    return math.log2(score) + half_lives(moment)
+
+
+def current(value, now):
+    '''Оценка на момент now по значению TrendingScore.score'''
+    return 2 ** (value - half_lives(now))
+
+
+def post_created(post):
+    '''Начальная оценка нового поста зависит от числа подписчиков
+    автора: логарифм, чтобы популярные авторы не занимали всю ленту'''
+    followers = Follow.objects.filter(author_id=post.author_id).count()
+    score = 1 + setting('TRENDING_FOLLOW_WEIGHT') * math.log1p(followers)
+    TrendingScore.objects.create(post=post,
+                                 score=stored(score, post.pub_date),
+                                 updated=post.pub_date)
+
+
+def add_score(post_id, weight, now):
+    '''Прибавляет weight к оценке на момент now одним UPDATE:
+    log2(2 ** (score - now) + weight) + now в единицах half_lives'''
+    at = half_lives(now)
+    if TrendingScore.objects.filter(post_id=post_id).update(
+            score=Log(2, Power(2, F('score') - at) + weight) + at,
+            updated=now):
+        return
+    try:
+        with transaction.atomic():
+            TrendingScore.objects.create(post_id=post_id,
+                                         score=stored(weight, now),
+                                         updated=now)
+    except IntegrityError:
+        # Строку только что создал параллельный запрос
+        add_score(post_id, weight, now)
+
+
+def comments_added(comments):
+    now = timezone.now()
+    weight = setting('TRENDING_COMMENT_WEIGHT')
+    counts = Counter(comment.post_id for comment in comments)
+    for post_id, count in sorted(counts.items()):
+        add_score(post_id, weight * count, now)
+
+
+def follows_added(author_ids):
+    '''Новые подписчики поднимают свежие посты автора'''
+    now = timezone.now()
+    weight = setting('TRENDING_FOLLOW_WEIGHT')
+    counts = Counter(author_ids)
+    recent = Post.objects.filter(
+        author_id__in=counts,
+        pub_date__gte=now - setting('TRENDING_WINDOW'),
+    ).values_list('pk', 'author_id').order_by('pk')
+    for post_id, author_id in recent:
+        add_score(post_id, weight * counts[author_id], now)
+
+
+def views_added(counts, weight):
+    '''Просмотры {post_id: число} поднимают только посты, уже
+    попавшие в ленту: старый пост не возвращается в нее от просмотров'''
+    if not weight:
+        return
+    now = timezone.now()
+    tracked = TrendingScore.objects.filter(pk__in=list(counts)).values_list(
+        'pk', flat=True).order_by('pk')
+    for post_id in tracked:
+        add_score(post_id, weight * counts[post_id], now)
+
+
+def prune(now=None):
+    '''Удаляет остывшие оценки (меньше TRENDING_MIN_SCORE на момент
+    now). Возвращает число удаленных.'''
+    now = now or timezone.now()
+    min_score = setting('TRENDING_MIN_SCORE')
+    deleted, _ = TrendingScore.objects.filter(
+        score__lt=stored(min_score, now)).delete()
+    return deleted
+
+
+def backfill(now=None):
+    '''Оценки для постов из окна TRENDING_WINDOW, у которых их нет
+    (посты до появления ленты). Возвращает число созданных.'''
+    now = now or timezone.now()
+    posts = Post.objects.filter(
+        trending__isnull=True,
+        pub_date__gte=now - setting('TRENDING_WINDOW'),
+    ).order_by('pk')
+    created = 0
+    for post in posts.iterator(chunk_size=BACKFILL_CHUNK_SIZE):
+        post_created(post)
+        comments = post.comments.count()
+        if comments:
+            add_score(post.pk, comments * setting('TRENDING_COMMENT_WEIGHT'),
+                      now)
+        created += 1
+    return created
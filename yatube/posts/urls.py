@@ -1,13 +1,28 @@
 from django.urls import path
 
-from . import views
+from . import feeds, renditions, sitemaps, views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
+    path('group/<slug:slug>/feed/', feeds.group_rss, name='group_feed'),
+    path('group/<slug:slug>/feed/atom/', feeds.group_atom,
+         name='group_feed_atom'),
+    path('feed/', feeds.index_rss, name='feed'),
+    path('feed/atom/', feeds.index_atom, name='feed_atom'),
     path('new/', views.new_post, name='new_post'),
     path('follow/', views.follow_index,
          name='follow_index'),
+    path('stream/', views.post_stream, name='post_stream'),
+    path('trending/', views.trending, name='trending'),
+    path('renditions/<str:name>/<str:fmt>/<path:source>',
+         renditions.serve, name='rendition'),
+    path('sitemap.xml', sitemaps.index, name='sitemap'),
+    path('sitemap-<slug:section>-<int:shard>.xml', sitemaps.section,
+         name='sitemap_section'),
+    path('<str:username>/feed/', feeds.author_rss, name='author_feed'),
+    path('<str:username>/feed/atom/', feeds.author_atom,
+         name='author_feed_atom'),
     path('<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('<str:username>/unfollow/', views.profile_unfollow,
@@ -0,0 +1,128 @@
+'''
+Счетчики просмотров постов с отложенной записью.
+
+Просмотр post_view не пишет в БД: счетчик процесса копит приращения, а
+фоновый поток раз в VIEW_COUNTS_INTERVAL секунд записывает их пачкой
+UPDATE ... SET views = views + N WHERE id IN (...), по одному запросу на
+каждое встречающееся значение N. Приращения заодно поднимают оценки
+ленты популярного (TRENDING_VIEW_WEIGHT за просмотр).
+
+Что не считается:
+* запросы роботов (VIEW_COUNTS_BOT_PATTERN по User-Agent, пустой
+  User-Agent) и HEAD;
+* повторный просмотр того же поста тем же посетителем (пользователь
+  или IP) в пределах одного окна.
+
+Гарантии сохранности: при аварийном завершении процесса теряется не
+больше одного окна просмотров этого воркера, при штатной остановке
+счетчик сбрасывается обработчиком atexit. Post.views в кэше объектов и
+закэшированных страницах отстает на время их жизни.
+'''
+import atexit
+import logging
+import re
+import threading
+from collections import Counter, defaultdict
+from functools import wraps
+
+from django.db import close_old_connections
+from django.db.models import F
+
+from . import trending
+from .conf import setting
+from .models import Post
+from .ratelimit import client_ip
+
+logger = logging.getLogger(__name__)
+
+# id постов в одном UPDATE: лимит параметров SQLite - 999
+IDS_PER_QUERY = 500
+
+
+def is_bot(request):
+    agent = request.META.get('HTTP_USER_AGENT', '')
+    return not agent or re.search(
+        setting('VIEW_COUNTS_BOT_PATTERN'),
+        agent, re.IGNORECASE) is not None
+
+
+def visitor(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'ip:{client_ip(request)}'
+
+
+class ViewCounter:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._counts = Counter()
+        # (post_id, посетитель) уже посчитанные в этом окне
+        self._seen = set()
+        self._thread = None
+
+    def __len__(self):
+        with self._condition:
+            return len(self._counts)
+
+    def add(self, post_id, visitor):
+        with self._condition:
+            if (post_id, visitor) in self._seen:
+                return
+            self._seen.add((post_id, visitor))
+            self._counts[post_id] += 1
+            self._start()
+            if len(self._seen) >= setting('VIEW_COUNTS_MAX_PENDING'):
+                self._condition.notify()
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run,
+                                            name='posts-view-counts',
+                                            daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait(timeout=setting('VIEW_COUNTS_INTERVAL'))
+            self.flush()
+            close_old_connections()
+
+    def flush(self):
+        '''Записывает накопленные приращения'''
+        with self._condition:
+            counts, self._counts = self._counts, Counter()
+            self._seen = set()
+        if not counts:
+            return
+        by_delta = defaultdict(list)
+        for post_id, delta in counts.items():
+            by_delta[delta].append(post_id)
+        try:
+            for delta, post_ids in by_delta.items():
+                for start in range(0, len(post_ids), IDS_PER_QUERY):
+                    Post.objects.filter(
+                        pk__in=post_ids[start:start + IDS_PER_QUERY]
+                    ).update(views=F('views') + delta)
+            trending.views_added(counts, setting('TRENDING_VIEW_WEIGHT'))
+        except Exception:
+            logger.exception('View counts lost for %d posts', len(counts))
+
+
+def counted(view):
+    '''Считает удачные GET-просмотры поста view(request, ..., post_id)'''
+    @wraps(view)
+    def wrapped(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if (setting('VIEW_COUNTS_ENABLED')
+                and request.method == 'GET'
+                and response.status_code == 200
+                and not is_bot(request)):
+            counter.add(int(kwargs['post_id']), visitor(request))
+        return response
+    return wrapped
+
+
+counter = ViewCounter()
+atexit.register(counter.flush)
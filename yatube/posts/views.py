@@ -2,20 +2,33 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 
+from . import degraded, events, holes, identity, viewcounts, writebehind
 from .models import Comment, Post, Group, Follow
 from .forms import PostForm, CommentForm
+from .conf import setting
+from .ratelimit import ratelimit
 
 User = get_user_model()
 CACHE_TIME = 20
+POSTS_PER_PAGE = 10
 
 
+def paginate(request, post_list):
+    '''Страница ленты; авторы и группы постов берутся через identity map'''
+    paginator = Paginator(post_list, POSTS_PER_PAGE)
+    page = paginator.get_page(request.GET.get('page'))
+    page.object_list = identity.Attached(page.object_list, 'author', 'group')
+    return page
+
+
+@degraded.keep_last_good
 def index(request):
     '''Главная страница'''
     post_list = Post.objects.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(request, post_list)
     return render(
         request,
         'index.html',
@@ -23,17 +36,30 @@ def index(request):
     )
 
 
+@degraded.keep_last_good
 def group_posts(request, slug):
     '''Страница группы'''
-    group = get_object_or_404(Group, slug=slug)
+    try:
+        group = identity.lookup(Group, slug=slug)
+    except Group.DoesNotExist:
+        raise Http404
     post_list = group.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(request, post_list)
     return render(request, 'group.html', {'group': group, 'page': page})
 
 
+@degraded.keep_last_good
+def trending(request):
+    '''Популярные посты: по комментариям и подписчикам автора с
+    затуханием, см. posts.trending'''
+    post_list = Post.objects.filter(trending__isnull=False).order_by(
+        '-trending__score', '-pub_date')
+    page = paginate(request, post_list)
+    return render(request, 'trending.html', {'page': page})
+
+
 @login_required
+@ratelimit('new_post')
 def new_post(request):
     '''Создание нового поста'''
     form = PostForm(request.POST or None, files=request.FILES or None,)
@@ -46,36 +72,35 @@ def new_post(request):
                   'is_edit': False})
 
 
+@degraded.keep_last_good
+@holes.shared_page('user:{username}', 'posts:{username}')
 def profile(request, username):
     '''Страница профиля пользователя'''
-    author = User.objects.get(username=username)
+    author = identity.lookup(User, username=username)
     post_list = author.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    following = (
-        request.user.is_authenticated
-        and Follow.objects.filter(user=request.user, author=author).exists()
-    )
+    page = paginate(request, post_list)
     context = {
         'author': author,
         'username': username,
         'page': page,
-        'following': following
     }
     return render(request, 'profile.html', context)
 
 
+@degraded.keep_last_good
+@viewcounts.counted
+@holes.shared_page('user:{username}', 'post:{post_id}')
 def post_view(request, username, post_id):
     '''Страница поста'''
-    requested_post = Post.objects.get(pk=post_id)
+    requested_post = identity.get(Post, post_id)
+    identity.attach([requested_post], 'author', 'group')
     comments = Comment.objects.filter(post=post_id)
-    form = CommentForm(request.POST or None)
+    # attach вычисляет queryset: авторы проставляются объектам в его кэше
+    identity.attach(comments, 'author')
     context = {
         'author': requested_post.author,
         'username': username,
         'requested_post': requested_post,
-        'form': form,
         'comments': comments
     }
     return render(request, 'post.html', context)
@@ -98,6 +123,7 @@ def post_edit(request, username, post_id):
 
 
 @login_required
+@ratelimit('add_comment')
 def add_comment(request, username, post_id):
     '''Добавление комментария на странице поста'''
     form = CommentForm(request.POST or None)
@@ -107,7 +133,10 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = requested_post
-        comment.save()
+        if writebehind.enabled():
+            writebehind.queue.add_comment(comment)
+        else:
+            comment.save()
     return redirect('post', username, post_id)
 
 
@@ -115,17 +144,20 @@ def add_comment(request, username, post_id):
 def follow_index(request):
     '''Страница подписок'''
     posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = paginate(request, posts)
     return render(request, "follow.html", {'page': page})
 
 
 @login_required
+@ratelimit('profile_follow')
 def profile_follow(request, username):
     '''Подписка на пользователя (кнока на странице профиля пользователя)'''
     author = get_object_or_404(User, username=username)
-    if request.user != author:
+    if request.user == author:
+        return redirect('profile', username)
+    if writebehind.enabled():
+        writebehind.queue.follow(request.user.pk, author.pk)
+    else:
         Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('profile', username)
 
@@ -133,12 +165,59 @@ def profile_follow(request, username):
 @login_required
 def profile_unfollow(request, username):
     '''Отписка от пользователя (кнока на странице профиля пользователя)'''
+    if writebehind.enabled():
+        author = get_object_or_404(User, username=username)
+        writebehind.queue.unfollow(request.user.pk, author.pk)
+        return redirect('profile', username)
     follow_link = get_object_or_404(Follow, user=request.user,
                                     author__username=username)
     follow_link.delete()
     return redirect('profile', username)
 
 
+def post_stream(request):
+    '''Поток новых постов (Server-Sent Events) для главной, группы
+    (?group=<slug>) или ленты подписок (?feed=follow)'''
+    group_slug = request.GET.get('group')
+    if group_slug:
+        group = get_object_or_404(Group, slug=group_slug)
+        channels = [events.group_channel(group.slug)]
+    elif request.GET.get('feed') == 'follow':
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        authors = Follow.objects.filter(
+            user=request.user).values_list('author_id', flat=True)
+        channels = [events.author_channel(pk) for pk in authors]
+    else:
+        channels = [events.index_channel()]
+
+    last_event_id = (request.META.get('HTTP_LAST_EVENT_ID')
+                     or request.GET.get('last_event_id'))
+    try:
+        last_event_id = int(last_event_id)
+    except (TypeError, ValueError):
+        last_event_id = None
+
+    subscription = events.broker.subscribe(channels)
+    if subscription is None:
+        response = HttpResponse('Слишком много открытых потоков',
+                                status=503)
+        response['Retry-After'] = setting('POSTS_STREAM_RETRY') // 1000
+        return response
+    response = StreamingHttpResponse(
+        events.stream_events(subscription, last_event_id,
+                             personalize=lambda html: holes.fill(request,
+                                                                 html)),
+        content_type='text/event-stream'
+    )
+    # Генератор, закрытый до первой итерации, не выполняет finally:
+    # подписку закрывает и сам ответ
+    response._closable_objects.append(subscription)
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 def page_not_found(request, exception):
     return render(
         request,
@@ -0,0 +1,196 @@
+'''
+Отложенная запись комментариев и подписок (write-behind).
+
+Вместо отдельной транзакции на каждый add_comment/profile_follow запросы
+ставят операцию в очередь процесса, а фоновый поток раз в
+POSTS_WRITE_BEHIND_WINDOW секунд записывает все накопленное одной
+транзакцией: комментарии через bulk_create, подписки и отписки - парой
+set-based запросов. На SQLite это один захват блокировки записи на пачку
+вместо одного на запрос.
+
+Гарантии сохранности:
+* операция подтверждается пользователю (редирект) до коммита, поэтому при
+  аварийном завершении процесса (kill -9, OOM) теряется не больше одного
+  окна записей этого воркера;
+* при штатной остановке (sys.exit, SIGTERM у gunicorn) очередь
+  сбрасывается обработчиком atexit;
+* комментарии к удаленным за окно постам и операции удаленных
+  пользователей отбрасываются перед записью, остальная пачка пишется;
+* ошибка при записи пачки откатывает всю пачку и пишется в лог, пачка не
+  повторяется;
+* свой комментарий пользователь может не увидеть сразу после редиректа,
+  если пачка еще не записана (не дольше окна).
+
+Включается настройкой POSTS_WRITE_BEHIND = True.
+'''
+import atexit
+import logging
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+from . import holes, trending
+from .conf import setting
+from .models import Comment, Follow, Post
+
+logger = logging.getLogger(__name__)
+
+# Пар (user_id, author_id) на один запрос: лимит параметров SQLite - 999
+PAIRS_PER_QUERY = 200
+IDS_PER_QUERY = 500
+
+
+def enabled():
+    return setting('POSTS_WRITE_BEHIND')
+
+
+class WriteBehindQueue:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._comments = []
+        # (user_id, author_id) -> True (подписка) / False (отписка);
+        # в пределах окна побеждает последняя операция
+        self._follows = {}
+        self._thread = None
+
+    def __len__(self):
+        with self._condition:
+            return len(self._comments) + len(self._follows)
+
+    def add_comment(self, comment):
+        self._put(lambda: self._comments.append(comment))
+
+    def follow(self, user_id, author_id):
+        self._put(lambda: self._follows.__setitem__((user_id, author_id),
+                                                    True))
+
+    def unfollow(self, user_id, author_id):
+        self._put(lambda: self._follows.__setitem__((user_id, author_id),
+                                                    False))
+
+    def _put(self, operation):
+        batch = setting('POSTS_WRITE_BEHIND_BATCH')
+        with self._condition:
+            operation()
+            self._start()
+            if len(self._comments) + len(self._follows) >= batch:
+                self._condition.notify()
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run,
+                                            name='posts-write-behind',
+                                            daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        window = setting('POSTS_WRITE_BEHIND_WINDOW')
+        while True:
+            with self._condition:
+                self._condition.wait(timeout=window)
+            self.flush()
+            close_old_connections()
+
+    def _take(self):
+        with self._condition:
+            comments, follows = self._comments, self._follows
+            self._comments, self._follows = [], {}
+        return comments, follows
+
+    def flush(self):
+        '''Записывает накопленное одной транзакцией'''
+        comments, follows = self._take()
+        if not comments and not follows:
+            return
+        try:
+            with transaction.atomic():
+                comments, follows = self._drop_orphans(comments, follows)
+                if comments:
+                    Comment.objects.bulk_create(comments)
+                    trending.comments_added(comments)
+                followed = self._write_follows(follows)
+                trending.follows_added(followed)
+                # bulk-запросы не посылают сигналов, общие страницы
+                # сбрасываем сами
+                scopes = holes.post_scopes(
+                    {comment.post_id for comment in comments})
+                user_ids = sorted({user_id for pair in follows
+                                   for user_id in pair})
+                for ids in chunks(user_ids):
+                    scopes |= holes.user_scopes(ids)
+            holes.bump(*scopes)
+        except Exception:
+            logger.exception('Write-behind batch lost: %d comments, '
+                             '%d follow operations',
+                             len(comments), len(follows))
+
+    def _drop_orphans(self, comments, follows):
+        '''Убирает операции, чьи пост или пользователь удалены за окно:
+        иначе одна нарушенная ссылка откатит всю пачку'''
+        posts = existing(Post, {comment.post_id for comment in comments})
+        users = existing(get_user_model(), {
+            *(comment.author_id for comment in comments),
+            *(user_id for user_id, _ in follows),
+            *(author_id for _, author_id in follows),
+        })
+        kept_comments = [comment for comment in comments
+                         if comment.post_id in posts
+                         and comment.author_id in users]
+        kept_follows = {pair: state for pair, state in follows.items()
+                        if pair[0] in users and pair[1] in users}
+        dropped = (len(comments) - len(kept_comments)
+                   + len(follows) - len(kept_follows))
+        if dropped:
+            logger.info('Write-behind dropped %d operations on deleted '
+                        'posts or users', dropped)
+        return kept_comments, kept_follows
+
+    def _write_follows(self, follows):
+        '''Применяет подписки и отписки, возвращает авторов новых
+        подписок'''
+        followed = []
+        subscribe = [pair for pair, state in follows.items() if state]
+        unsubscribe = [pair for pair, state in follows.items() if not state]
+        for pairs in chunks(unsubscribe):
+            Follow.objects.filter(pairs_filter(pairs)).delete()
+        for pairs in chunks(subscribe):
+            # У Follow нет уникального ограничения, поэтому существующие
+            # подписки отсеиваем сами, как get_or_create во view
+            existing = set(Follow.objects.filter(
+                pairs_filter(pairs)).values_list('user_id', 'author_id'))
+            created = [pair for pair in pairs if pair not in existing]
+            Follow.objects.bulk_create(
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in created
+            )
+            followed.extend(author_id for _, author_id in created)
+        return followed
+
+
+def chunks(items):
+    for start in range(0, len(items), PAIRS_PER_QUERY):
+        yield items[start:start + PAIRS_PER_QUERY]
+
+
+def existing(model, ids):
+    '''Множество существующих pk из ids'''
+    ids = sorted(ids)
+    found = set()
+    for start in range(0, len(ids), IDS_PER_QUERY):
+        found.update(model._default_manager.filter(
+            pk__in=ids[start:start + IDS_PER_QUERY]).values_list(
+                'pk', flat=True))
+    return found
+
+
+def pairs_filter(pairs):
+    condition = Q()
+    for user_id, author_id in pairs:
+        condition |= Q(user_id=user_id, author_id=author_id)
+    return condition
+
+
+queue = WriteBehindQueue()
+atexit.register(queue.flush)
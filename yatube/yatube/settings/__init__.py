@@ -0,0 +1,13 @@
+'''
+Выбор настроек по окружению: DJANGO_ENV=prod - production (prod.py),
+иначе - настройки для разработки (dev.py).
+
+Модули можно указать и напрямую: DJANGO_SETTINGS_MODULE=yatube.settings.prod
+'''
+
+import os
+
+if os.environ.get('DJANGO_ENV', 'dev') == 'prod':
+    from .prod import *  # noqa: F401,F403
+else:
+    from .dev import *  # noqa: F401,F403
@@ -0,0 +1,381 @@
+'''
+Django settings for yatube project: common part for all environments.
+
+Окружение выбирается в yatube/settings/__init__.py (DJANGO_ENV=dev|prod),
+все, что отличается между машинами, читается из переменных окружения.
+
+Generated by 'django-admin startproject' using Django 2.2.19.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/2.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/2.2/ref/settings/
+'''
+
+import os
+from datetime import timedelta
+
+
+def env(name, default=None):
+    return os.environ.get(name, default)
+
+
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def env_list(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+SECRET_KEY = env('DJANGO_SECRET_KEY')
+
+DEBUG = env_bool('DJANGO_DEBUG', False)
+
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS', [
+    "localhost",
+    "127.0.0.1",
+    "[::1]",
+    "testserver",
+])
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'posts',
+    'users',
+    'about',
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'django.middleware.security.SecurityMiddleware',
+    'posts.compression.CompressionMiddleware',
+    'posts.loadshed.LoadSheddingMiddleware',
+    'posts.degraded.DegradedModeMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'posts.identity.IdentityMapMiddleware',
+    'posts.holes.HolePunchMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [TEMPLATES_DIR],
+        'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'yatube.context_processors.year',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': env('DB_ENGINE', 'django.db.backends.sqlite3'),
+        'NAME': env('DB_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+        'USER': env('DB_USER', ''),
+        'PASSWORD': env('DB_PASSWORD', ''),
+        'HOST': env('DB_HOST', ''),
+        'PORT': env('DB_PORT', ''),
+        # Постоянные соединения: 0 - новое соединение на каждый запрос
+        'CONN_MAX_AGE': env_int('DB_CONN_MAX_AGE', 0),
+    }
+}
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = env('DJANGO_STATIC_URL', '/static/')
+STATIC_ROOT = env('DJANGO_STATIC_ROOT', os.path.join(BASE_DIR, 'static'))
+# Каталоги с исходной статикой (bootstrap, jquery) для collectstatic
+STATICFILES_DIRS = env_list('DJANGO_STATICFILES_DIRS', [])
+
+
+MEDIA_URL = env('DJANGO_MEDIA_URL', '/media/')
+MEDIA_ROOT = env('DJANGO_MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
+DEFAULT_FILE_STORAGE = env('DJANGO_FILE_STORAGE',
+                           'django.core.files.storage.FileSystemStorage')
+
+# Login
+
+LOGIN_URL = "/auth/login/"
+LOGIN_REDIRECT_URL = "index"
+
+# Email
+
+EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
+
+# Cache
+
+CACHES = {
+    'default': {
+        'BACKEND': env('CACHE_BACKEND',
+                       'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env('CACHE_LOCATION', ''),
+    }
+}
+
+# Поток новых постов (Server-Sent Events)
+
+POSTS_STREAM_HEARTBEAT = 15
+POSTS_STREAM_TIMEOUT = 300
+POSTS_STREAM_MAX_CONNECTIONS = 50
+POSTS_STREAM_BACKLOG = 100
+# Пауза до переподключения клиента, мс
+POSTS_STREAM_RETRY = 3000
+POSTS_STREAM_QUEUE_SIZE = 100
+
+# Ограничение частоты записи (posts.ratelimit): '<запросов>/<s|m|h|d>'
+
+RATELIMIT_ENABLED = env_bool('RATELIMIT_ENABLED', True)
+RATELIMIT_CACHE = 'default'
+# Заголовок с IP клиента за прокси, например 'HTTP_X_FORWARDED_FOR'
+RATELIMIT_IP_HEADER = env('RATELIMIT_IP_HEADER')
+RATELIMITS = {
+    'new_post': {'user': '10/m', 'ip': '30/m'},
+    'add_comment': {'user': '20/m', 'ip': '60/m'},
+    'profile_follow': {'user': '30/m', 'ip': '120/m',
+                       'methods': ['GET', 'POST']},
+}
+
+# Отложенная пакетная запись комментариев и подписок (posts.writebehind)
+
+POSTS_WRITE_BEHIND = env_bool('POSTS_WRITE_BEHIND', False)
+POSTS_WRITE_BEHIND_WINDOW = 0.05
+POSTS_WRITE_BEHIND_BATCH = 500
+
+# Кэш объектов User/Group/Post между запросами (posts.objcache)
+
+OBJECT_CACHE = 'default'
+OBJECT_CACHE_TIMEOUT = 300
+# Размер и время жизни LRU в памяти процесса; 0 - без него
+OBJECT_CACHE_L1_SIZE = env_int('OBJECT_CACHE_L1_SIZE', 1000)
+OBJECT_CACHE_L1_TTL = 5
+
+# Общие страницы с персональными фрагментами (posts.holes)
+
+SHARED_PAGE_CACHE = 'default'
+SHARED_PAGE_TIMEOUT = 60
+
+# Single-flight для кэшей лент, фрагментов и объектов (posts.singleflight):
+# сколько секунд отдавать устаревшее значение и ждать чужого пересчета
+
+SINGLE_FLIGHT_STALE = 60
+SINGLE_FLIGHT_WAIT = 0.5
+SINGLE_FLIGHT_LOCK_TIMEOUT = 10
+
+# Режим деградации при медленной или недоступной БД (posts.degraded):
+# бюджет времени запросов к БД на запрос, число сбоев подряд до
+# размыкания автомата и пауза до пробного запроса
+
+DEGRADED_MODE_ENABLED = env_bool('DEGRADED_MODE_ENABLED', True)
+DEGRADED_CACHE = 'default'
+DEGRADED_DB_BUDGET = 2.0
+DEGRADED_FAILURE_THRESHOLD = 5
+DEGRADED_COOLDOWN = 30
+# Сколько хранить последнюю удачную отрисовку и как часто ее обновлять
+DEGRADED_PAGE_TIMEOUT = 24 * 60 * 60
+DEGRADED_REFRESH = 30
+
+# Сброс нагрузки (posts.loadshed): пороги одновременных запросов воркера
+# и ожидания в очереди (X-Request-Start) для приоритетов low и normal;
+# запись и запросы вошедших пользователей (подписанная cookie
+# LOAD_SHEDDING_COOKIE ставится при входе) не сбрасываются
+
+LOAD_SHEDDING_ENABLED = env_bool('LOAD_SHEDDING_ENABLED', True)
+LOAD_SHEDDING_LIMITS = {
+    'low': {'in_flight': 4, 'queue_wait': 0.5},
+    'normal': {'in_flight': 16, 'queue_wait': 2.0},
+}
+LOAD_SHEDDING_LOW_PRIORITY_PATHS = [
+    r'^/about/',
+    r'^/admin/posts/\w+/export/',
+    r'^/sitemap',
+]
+# Анонимные страницы ленты дальше этой - низкий приоритет
+LOAD_SHEDDING_DEEP_PAGE = 5
+LOAD_SHEDDING_RETRY_AFTER = 5
+LOAD_SHEDDING_COOKIE = 'signed_in'
+
+# Лента популярного (posts.trending): период полураспада оценки в
+# секундах и веса комментария и нового подписчика автора
+
+TRENDING_HALF_LIFE = 6 * 60 * 60
+TRENDING_COMMENT_WEIGHT = 1.0
+TRENDING_FOLLOW_WEIGHT = 0.5
+# Какие посты поднимает новый подписчик и ниже какой оценки пост
+# выпадает из ленты
+TRENDING_WINDOW = timedelta(days=7)
+TRENDING_MIN_SCORE = 0.05
+
+# Счетчики просмотров постов (posts.viewcounts): окно записи в секундах
+
+VIEW_COUNTS_ENABLED = env_bool('VIEW_COUNTS_ENABLED', True)
+VIEW_COUNTS_INTERVAL = 10
+VIEW_COUNTS_MAX_PENDING = 10000
+VIEW_COUNTS_BOT_PATTERN = (r'bot|crawl|spider|slurp|fetch|curl|wget|'
+                           r'python-requests|headless')
+TRENDING_VIEW_WEIGHT = 0.02
+
+# Раздача медиа (posts.media): передача файла веб-серверу через
+# 'x-accel-redirect' (nginx, internal location MEDIA_ACCEL_PREFIX с alias
+# на MEDIA_ROOT) или 'x-sendfile' (Apache, lighttpd); без значения файл
+# отдает сам Django
+
+MEDIA_SENDFILE = env('MEDIA_SENDFILE', None)
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_SERVE_PREFIXES = ('posts/', 'cache/')
+MEDIA_IMMUTABLE_PREFIXES = ('cache/',)
+# Кэширование файлов со старыми именами; имена по хэшу - год и immutable
+MEDIA_MAX_AGE = 60 * 60
+
+# Копии изображений постов (posts.renditions): размеры по именам,
+# форматы в порядке предпочтения (последний - для <img>) и предельный
+# размер каталога копий в байтах
+
+IMAGE_RENDITIONS = {
+    'card': {'size': (960, 339), 'crop': True},
+}
+IMAGE_RENDITION_FORMATS = ('webp', 'jpeg')
+IMAGE_RENDITION_QUALITY = 85
+IMAGE_RENDITION_CACHE_SIZE = env_int('IMAGE_RENDITION_CACHE_SIZE',
+                                     512 * 1024 * 1024)
+# Сколько ждать копию, которую создает другой воркер
+IMAGE_RENDITION_WAIT = 5
+# Проверка размера каталога не чаще раза в столько секунд
+IMAGE_RENDITION_EVICT_INTERVAL = 10
+
+# Метаданные миниатюр sorl-thumbnail (posts.thumbnails): общий кэш и LRU
+# процесса вместо таблицы в БД
+
+THUMBNAIL_KVSTORE = 'posts.thumbnails.KVStore'
+THUMBNAIL_LOCAL_SIZE = 1000
+THUMBNAIL_LOCAL_TIMEOUT = 60
+
+# Статика (posts.staticfiles): заранее сжатые копии при collectstatic для
+# файлов с этими расширениями и передача через nginx по
+# STATIC_ACCEL_PREFIX при MEDIA_SENDFILE = 'x-accel-redirect'
+
+STATIC_COMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.map',
+                              '.txt', '.xml', '.html', '.ico')
+# Файлы меньше порога в байтах не сжимаются
+STATIC_COMPRESS_MIN_SIZE = 256
+STATIC_ACCEL_PREFIX = '/protected-static/'
+# Кэширование файлов без хэша в имени
+STATIC_MAX_AGE = 60 * 60
+
+# Сжатие ответов (posts.compression): ответы короче порога в байтах
+# отдаются как есть
+
+COMPRESSION_ENABLED = env_bool('COMPRESSION_ENABLED', True)
+COMPRESSION_MIN_LENGTH = 1024
+COMPRESSION_CONTENT_TYPES = (
+    'text/html',
+    'text/plain',
+    'text/csv',
+    'text/xml',
+    'application/json',
+    'application/xml',
+    'application/rss+xml',
+    'application/atom+xml',
+)
+
+# Карты сайта (posts.sitemaps): адресов в одной части индекса и время
+# жизни части в кэше (часть сбрасывается и при изменении ее строк)
+
+SITEMAP_SHARD_SIZE = 50000
+# Строк из БД за один запрос при выгрузке части
+SITEMAP_CHUNK_SIZE = 2000
+SITEMAP_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+# Ленты RSS и Atom (posts.feeds): постов в ленте и сколько клиенты и
+# прокси могут не перепроверять ленту
+
+FEED_ITEMS = 20
+FEED_MAX_AGE = 5 * 60
+FEED_CACHE_TIMEOUT = 24 * 60 * 60
@@ -0,0 +1,13 @@
+'''
+Development settings: DEBUG, локальная SQLite и LocMemCache.
+'''
+
+from .base import *  # noqa: F401,F403
+from .base import env, env_bool
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = env('DJANGO_SECRET_KEY',
+                 'z*9b-d$470*6uc%)kdhgo&khbvba9(*82hf0c96#w5pjj=!v(+')
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = env_bool('DJANGO_DEBUG', True)
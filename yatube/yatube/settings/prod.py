@@ -0,0 +1,74 @@
+'''
+Production settings for yatube project.
+
+Запуск: DJANGO_ENV=prod или DJANGO_SETTINGS_MODULE=yatube.settings.prod
+'''
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+from .base import (DATABASES, SECRET_KEY, TEMPLATE_LOADERS, TEMPLATES, env,
+                   env_int, env_list)
+
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Set DJANGO_SECRET_KEY for production')
+
+# Адреса сайта задаются явно: localhost и testserver из base.py здесь не
+# подходят
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS', [])
+if not ALLOWED_HOSTS:
+    raise ImproperlyConfigured('Set DJANGO_ALLOWED_HOSTS for production')
+
+# Кэш общий для всех воркеров: у locmem из base.py он свой в каждом
+# процессе, и сбросы кэша в одном воркере не видны другим
+if not env('CACHE_BACKEND') or not env('CACHE_LOCATION'):
+    raise ImproperlyConfigured(
+        'Set CACHE_BACKEND and CACHE_LOCATION for production')
+
+DEBUG = False
+
+# Соединение с БД живет между запросами воркера
+DATABASES['default']['CONN_MAX_AGE'] = env_int('DB_CONN_MAX_AGE', 60)
+
+# Шаблоны компилируются один раз на процесс: cached loader держит
+# скомпилированные Template в памяти вместо чтения файлов на каждый рендер
+TEMPLATES[0]['OPTIONS'].update({
+    'debug': False,
+    'loaders': [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
+})
+
+# Имена статики с хэшем содержимого и сжатые копии (posts.staticfiles);
+# нужен collectstatic при выкладке
+STATICFILES_STORAGE = env(
+    'DJANGO_STATICFILES_STORAGE',
+    'posts.staticfiles.CompressedManifestStaticFilesStorage')
+
+# Logging
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'verbose': {
+            'format': '{asctime} {levelname} {name} {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'verbose',
+        },
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': env('LOG_LEVEL', 'WARNING'),
+    },
+    'loggers': {
+        'django': {
+            'handlers': ['console'],
+            'level': env('DJANGO_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
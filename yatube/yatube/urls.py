@@ -1,9 +1,12 @@
+import re
+
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
 from django.conf.urls import handler404, handler500
 
+from posts import media, staticfiles
+
 handler404 = "posts.views.page_not_found"  # noqa
 handler500 = "posts.views.server_error"  # noqa
 
@@ -12,11 +15,19 @@ urlpatterns = [
     path("auth/", include("django.contrib.auth.urls")),
     path('admin/', admin.site.urls),
     path('about/', include('about.urls', namespace='about')),
-    path('', include('posts.urls')),
-] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL,
-                          document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL,
-                          document_root=settings.STATIC_ROOT)
+# Медиа и статику отдают posts.media и posts.staticfiles и при
+# DEBUG = False, если адреса не внешние
+if settings.MEDIA_URL.startswith('/'):
+    urlpatterns.append(re_path(
+        r'^{}(?P<path>.+)$'.format(re.escape(settings.MEDIA_URL[1:])),
+        media.serve, name='media'))
+if settings.STATIC_URL.startswith('/'):
+    urlpatterns.append(re_path(
+        r'^{}(?P<path>.+)$'.format(re.escape(settings.STATIC_URL[1:])),
+        staticfiles.serve, name='static'))
+
+urlpatterns += [
+    path('', include('posts.urls')),
+]